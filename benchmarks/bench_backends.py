@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+import pdf_engine
+from benchmarks.corpus import make_document
+from pdf_backends import BACKENDS
+
+
+def describe(path):
+    doc = fitz.open(path)
+    try:
+        return {
+            "pages": len(doc),
+            "toc": doc.get_toc(),
+            "rotations": [page.rotation for page in doc]
+        }
+    finally:
+        doc.close()
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run(files, pages, repeat):
+    work_dir = tempfile.mkdtemp(prefix="pdf_bench_")
+    try:
+        inputs = []
+        for index in range(files):
+            path = os.path.join(work_dir, f"input_{index}.pdf")
+            make_document(path, pages, index)
+            inputs.append(path)
+
+        results = {}
+        outputs = {}
+        for name in BACKENDS:
+            merge_times = []
+            split_times = []
+            for attempt in range(repeat):
+                merged = os.path.join(work_dir, f"merged_{name}.pdf")
+                result, elapsed = timed(pdf_engine.merge_pdfs, inputs, merged, backend=name)
+                merge_times.append(elapsed)
+
+                split_dir = os.path.join(work_dir, f"split_{name}_{attempt}")
+                os.makedirs(split_dir)
+                _, elapsed = timed(pdf_engine.split_pdf, merged, split_dir, backend=name)
+                split_times.append(elapsed)
+                shutil.rmtree(split_dir)
+
+            outputs[name] = describe(merged)
+            total_pages = result.page_count
+            results[name] = {
+                "merge_seconds": min(merge_times),
+                "merge_pages_per_sec": total_pages / min(merge_times),
+                "split_seconds": min(split_times),
+                "split_pages_per_sec": total_pages / min(split_times)
+            }
+
+        # Both backends must produce the same page count, bookmarks and rotation
+        reference = outputs[next(iter(outputs))]
+        for name, description in outputs.items():
+            results[name]["equivalent"] = description == reference
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare merge and split throughput per backend")
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run(args.files, args.pages, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'backend':<10} {'merge p/s':>12} {'split p/s':>12}  equivalent")
+    for name, numbers in results.items():
+        print(f"{name:<10} {numbers['merge_pages_per_sec']:>12.0f} {numbers['split_pages_per_sec']:>12.0f}  {numbers['equivalent']}")
+
+
+if __name__ == '__main__':
+    main()
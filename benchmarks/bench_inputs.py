@@ -0,0 +1,109 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.corpus import make_large_document
+
+# "read" is how PyPDF2 opens a path: the whole file copied into a BytesIO.
+# "mmap" is pdf_sources.open_input.
+INPUT_MODES = ["read", "mmap"]
+
+
+def _run_case(mode, path):
+    # Runs in a fresh spawned process so peak RSS belongs to this case alone
+    from PyPDF2 import PdfReader
+    from pdf_metrics import peak_rss
+    from pdf_sources import open_input
+
+    baseline_rss = peak_rss()
+    start = time.perf_counter()
+    if mode == "read":
+        pdf = PdfReader(path)
+        opened = time.perf_counter()
+        pages = _walk(pdf)
+    else:
+        with open_input(path) as mapped:
+            pdf = PdfReader(mapped)
+            opened = time.perf_counter()
+            pages = _walk(pdf)
+    elapsed = time.perf_counter() - start
+    return {
+        "open_seconds": opened - start,
+        "wall_seconds": elapsed,
+        "pages": pages,
+        "baseline_rss": baseline_rss,
+        "peak_rss": peak_rss()
+    }
+
+
+def _walk(pdf):
+    # Decodes every page's content and image streams, as a split or merge would copy them
+    for page in pdf.pages:
+        page.get_contents()
+        # Either dictionary may be an indirect reference
+        resources = page.get("/Resources")
+        resources = resources.get_object() if resources is not None else {}
+        xobjects = resources.get("/XObject")
+        xobjects = xobjects.get_object() if xobjects is not None else {}
+        for xobject in xobjects.values():
+            xobject.get_object().get_data()
+    return len(pdf.pages)
+
+
+def measure(mode, path, repeat):
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        with context.Pool(1) as pool:
+            runs.append(pool.apply(_run_case, (mode, path)))
+    best = min(runs, key=lambda run: run["wall_seconds"])
+    return {
+        "open_seconds": best["open_seconds"],
+        "wall_seconds": best["wall_seconds"],
+        "pages": best["pages"],
+        "rss_growth": max((run["peak_rss"] or 0) - (run["baseline_rss"] or 0) for run in runs),
+        "repeat": repeat
+    }
+
+
+def run(size_mb, repeat, path=None):
+    work_dir = tempfile.mkdtemp(prefix="pdf_bench_")
+    try:
+        if not path:
+            path = os.path.join(work_dir, "large.pdf")
+            make_large_document(path, size_mb)
+        results = {"input_bytes": os.path.getsize(path)}
+        for mode in INPUT_MODES:
+            results[mode] = measure(mode, path, repeat)
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare copying and memory-mapped PDF input")
+    parser.add_argument("--size-mb", type=float, default=2048, help="Size of the generated input")
+    parser.add_argument("--input", help="Use this PDF instead of generating one")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run(args.size_mb, args.repeat, args.input)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Input: {results['input_bytes'] / (1024 * 1024):.0f} MB")
+    print(f"{'mode':<6} {'open s':>8} {'total s':>8} {'RSS growth MB':>14}")
+    for mode in INPUT_MODES:
+        numbers = results[mode]
+        print(f"{mode:<6} {numbers['open_seconds']:>8.2f} {numbers['wall_seconds']:>8.2f} "
+              f"{numbers['rss_growth'] / (1024 * 1024):>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
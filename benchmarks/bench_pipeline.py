@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import pdf_engine
+from benchmarks.corpus import image_bytes, make_document, make_photo
+from pdf_pipeline import run_pipeline
+
+STEPS = ["convert", "merge", {"op": "rotate", "rotation": 90, "pages": "odd"}, {"op": "compress", "preset": "ebook"}]
+
+
+def build_inputs(work_dir, images, pdfs, pages):
+    inputs = []
+    for index in range(images):
+        path = os.path.join(work_dir, f"scan_{index}.jpg")
+        with open(path, "wb") as f:
+            f.write(image_bytes(make_photo(index)))
+        inputs.append(path)
+    for index in range(pdfs):
+        path = os.path.join(work_dir, f"input_{index}.pdf")
+        make_document(path, pages, index)
+        inputs.append(path)
+    return inputs
+
+
+def chained(inputs, output, work_dir):
+    # The same steps one tool at a time, each writing a file the next one parses
+    images = [path for path in inputs if path.endswith(".jpg")]
+    pdfs = [path for path in inputs if path.endswith(".pdf")]
+    converted = os.path.join(work_dir, "converted.pdf")
+    merged = os.path.join(work_dir, "merged.pdf")
+    rotated = os.path.join(work_dir, "rotated.pdf")
+    pdf_engine.convert_to_pdf(images, converted)
+    pdf_engine.merge_pdfs([converted] + pdfs, merged)
+    pdf_engine.rotate_pages(merged, rotated, rotation=90, pages="odd")
+    pdf_engine.compress_pdf(rotated, output, preset="ebook")
+    written = sum(os.path.getsize(path) for path in (converted, merged, rotated, output))
+    return written
+
+
+def in_memory(inputs, output, work_dir):
+    run_pipeline(STEPS, output, inputs)
+    return os.path.getsize(output)
+
+
+def run(images, pdfs, pages, repeat):
+    work_dir = tempfile.mkdtemp(prefix="pdf_bench_")
+    try:
+        inputs = build_inputs(work_dir, images, pdfs, pages)
+        results = {}
+        for name, func in (("chained", chained), ("pipeline", in_memory)):
+            best = None
+            for attempt in range(repeat):
+                output = os.path.join(work_dir, f"{name}_{attempt}.pdf")
+                start = time.perf_counter()
+                written = func(inputs, output, work_dir)
+                elapsed = time.perf_counter() - start
+                if best is None or elapsed < best["wall_seconds"]:
+                    best = {"wall_seconds": elapsed, "bytes_written": written, "output_bytes": os.path.getsize(output)}
+            results[name] = best
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare chained tools with an in-memory pipeline")
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--pdfs", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=20, help="Pages per generated PDF")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run(args.images, args.pdfs, args.pages, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<9} {'seconds':>8} {'MB written':>11} {'output MB':>10}")
+    for name, numbers in results.items():
+        print(f"{name:<9} {numbers['wall_seconds']:>8.2f} {numbers['bytes_written'] / (1024 * 1024):>11.1f} "
+              f"{numbers['output_bytes'] / (1024 * 1024):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
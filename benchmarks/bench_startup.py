@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Cold start budget from launching Python to the first painted window
+STARTUP_TARGET_MS = 300
+# Libraries that should only load once a tool is used
+HEAVY_MODULES = ["fitz", "PyPDF2", "PIL", "img2pdf", "requests", "pdf_engine"]
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import pdf_merger_gui
+imported = time.perf_counter()
+painted = None
+try:
+    root = pdf_merger_gui.Tk()
+    app = pdf_merger_gui.PDFMergerApp(root)
+    root.update()
+    painted = time.perf_counter()
+    app.on_close()
+except pdf_merger_gui.TclError as e:
+    print(f"No display, measuring imports only: {e}", file=sys.stderr)
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "paint_ms": (painted - start) * 1000 if painted else None,
+    "heavy_modules": [name for name in %r if name in sys.modules]
+}))
+""" % (HEAVY_MODULES,)
+
+
+def measure_once():
+    # Timed from outside, so interpreter startup is included
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT],
+        cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    total_ms = (time.perf_counter() - start) * 1000
+    # The update check thread may print too, so pick out our line
+    line = next(line for line in completed.stdout.splitlines() if line.startswith('{"import_ms"'))
+    numbers = json.loads(line)
+    numbers["process_ms"] = total_ms
+    return numbers
+
+
+def run(repeat):
+    runs = [measure_once() for _ in range(repeat)]
+    paints = [run["paint_ms"] for run in runs if run["paint_ms"] is not None]
+    return {
+        "import_ms": statistics.median(run["import_ms"] for run in runs),
+        "paint_ms": statistics.median(paints) if paints else None,
+        "process_ms": statistics.median(run["process_ms"] for run in runs),
+        "heavy_modules": sorted({name for run in runs for name in run["heavy_modules"]}),
+        "target_ms": STARTUP_TARGET_MS,
+        "repeat": repeat
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure GUI cold start time")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        paint = "n/a" if results["paint_ms"] is None else f"{results['paint_ms']:.0f} ms"
+        print(f"Import:      {results['import_ms']:.0f} ms")
+        print(f"First paint: {paint} (target {STARTUP_TARGET_MS} ms)")
+        print(f"Process:     {results['process_ms']:.0f} ms")
+        if results["heavy_modules"]:
+            print(f"Loaded at startup: {', '.join(results['heavy_modules'])}")
+
+    # Imports alone count against the budget when there is no display
+    elapsed = results["paint_ms"] if results["paint_ms"] is not None else results["import_ms"]
+    return 1 if elapsed > STARTUP_TARGET_MS or results["heavy_modules"] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
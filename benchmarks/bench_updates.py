@@ -0,0 +1,160 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pdf_updates
+
+EXECUTABLE = "PDF_Merger.exe"
+RANGE = re.compile(r"bytes=(\d+)-")
+
+
+class ReleaseServer(ThreadingHTTPServer):
+    # Local stand-in for the release API and its asset downloads. The first
+    # `drops` executable downloads are cut off halfway through.
+    daemon_threads = True
+
+    def __init__(self, payload, drops=1):
+        super().__init__(("127.0.0.1", 0), ReleaseHandler)
+        self.payload = payload
+        self.drops = drops
+        self.requests = []
+        self.manifest = f"{hashlib.sha256(payload).hexdigest()}  {EXECUTABLE}\n".encode()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class ReleaseHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get("Range")))
+        if self.path == "/releases/latest":
+            # The manifest comes first, as GitHub is free to list it
+            self._send(200, json.dumps({"tag_name": "v9.9.9", "assets": [
+                {"name": pdf_updates.MANIFEST_ASSET,
+                 "browser_download_url": f"{server.base_url}/{pdf_updates.MANIFEST_ASSET}"},
+                {"name": EXECUTABLE, "browser_download_url": f"{server.base_url}/{EXECUTABLE}"}
+            ]}).encode())
+        elif self.path == f"/{pdf_updates.MANIFEST_ASSET}":
+            self._send(200, server.manifest)
+        elif self.path == f"/{EXECUTABLE}":
+            self._send_executable()
+        else:
+            self._send(404, b"")
+
+    def _send(self, status, body, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_executable(self):
+        payload = self.server.payload
+        match = RANGE.match(self.headers.get("Range", ""))
+        start = int(match.group(1)) if match else 0
+        if start >= len(payload):
+            self._send(416, b"", [("Content-Range", f"bytes */{len(payload)}")])
+            return
+        body = payload[start:]
+        self.send_response(206 if match else 200)
+        self.send_header("Content-Length", str(len(body)))
+        if match:
+            self.send_header("Content-Range", f"bytes {start}-{len(payload) - 1}/{len(payload)}")
+        self.end_headers()
+        if self.server.drops:
+            self.server.drops -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+def serve(payload, drops=1):
+    server = ReleaseServer(payload, drops)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def check_downloads(size_mb=1):
+    # Self-check against a local server, no network needed; raises
+    # AssertionError on the first failure and returns the timings otherwise
+    payload = os.urandom(int(size_mb * 1024 * 1024))
+    results = {"size_mb": size_mb}
+    with tempfile.TemporaryDirectory() as work:
+        dest = os.path.join(work, "PDF_Merger_new.exe")
+
+        # Dropped connection: the second request must resume with a Range
+        server = serve(payload, drops=1)
+        try:
+            release = pdf_updates.fetch_latest_release(f"{server.base_url}/releases/latest")
+            assert pdf_updates.asset_name(release["download_url"]) == EXECUTABLE, \
+                f"picked {release['download_url']} instead of {EXECUTABLE}"
+            checksum = pdf_updates.expected_checksum(release, release["download_url"])
+            start = time.perf_counter()
+            pdf_updates.download_file(release["download_url"], dest, sha256=checksum)
+            results["seconds"] = time.perf_counter() - start
+            with open(dest, "rb") as f:
+                assert f.read() == payload, "resumed download differs from the original"
+            ranges = [value for path, value in server.requests if path == f"/{EXECUTABLE}"]
+            assert ranges == [None, f"bytes={len(payload) // 2}-"], \
+                f"expected one full and one resumed request, got {ranges}"
+            results["resumed_from"] = len(payload) // 2
+
+            # Wrong checksum: rejected and the part file is removed
+            os.remove(dest)
+            try:
+                pdf_updates.download_file(release["download_url"], dest, sha256="0" * 64)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("a wrong checksum was accepted")
+            assert not os.path.exists(dest + ".part"), "part file kept after a checksum mismatch"
+            assert not os.path.exists(dest), "unverified file renamed into place"
+
+            # A stale part file from an older release is replaced, not trusted
+            with open(dest + ".part", "wb") as f:
+                f.write(os.urandom(len(payload) // 3))
+            pdf_updates.download_file(release["download_url"], dest, sha256=checksum)
+            with open(dest, "rb") as f:
+                assert f.read() == payload, "stale part file was not discarded"
+        finally:
+            server.shutdown()
+            server.server_close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check update downloads against a local release server")
+    parser.add_argument("--size-mb", type=float, default=8)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    try:
+        results = check_downloads(args.size_mb)
+    except AssertionError as e:
+        print(f"FAILED: {e}")
+        return 1
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"Downloaded {results['size_mb']:g} MB in {results['seconds']:.2f}s, "
+              f"resumed at byte {results['resumed_from']}")
+        print("Asset choice, resume, checksum rejection and stale part recovery all passed")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,115 @@
+import io
+import os
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw
+
+# name: (files, pages per file, kind) at scale 1.0
+CORPORA = {
+    "small_files": (200, 2, "text"),
+    "huge_files": (3, 1000, "text"),
+    "scans": (10, 20, "scan"),
+    "text": (20, 50, "text")
+}
+PHOTO_COUNT = 100
+LOREM = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. "
+
+
+def make_photo(index, size=(1240, 1754)):
+    # Deterministic stand-in for a phone scan: gradient background plus text
+    image = Image.radial_gradient("L").resize(size).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for line in range(0, size[1], 40):
+        draw.text((60, line), f"{index:05d} {LOREM}", fill=((index * 37) % 256, 40, 90))
+    return image
+
+
+def image_bytes(image, fmt="JPEG"):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, quality=85)
+    return buffer.getvalue()
+
+
+def make_logo():
+    logo = Image.new("RGB", (200, 80), "white")
+    ImageDraw.Draw(logo).text((10, 30), "ACME Corp", fill="navy")
+    return image_bytes(logo, "PNG")
+
+
+def make_document(path, pages, index, kind="text"):
+    # Text pages get a bookmark per ten pages and every fifth page rotated.
+    # Scan pages are one full-page JPEG plus a logo shared by every page.
+    doc = fitz.open()
+    toc = []
+    logo_xref = 0
+    scan = image_bytes(make_photo(index)) if kind == "scan" else None
+    for page_num in range(pages):
+        page = doc.new_page()
+        if kind == "scan":
+            page.insert_image(page.rect, stream=scan)
+            logo_rect = fitz.Rect(36, 36, 136, 76)
+            if logo_xref:
+                page.insert_image(logo_rect, xref=logo_xref)
+            else:
+                logo_xref = page.insert_image(logo_rect, stream=make_logo())
+        else:
+            page.insert_text((72, 72), f"Document {index} page {page_num + 1}", fontsize=14)
+            page.insert_textbox(fitz.Rect(72, 100, 540, 760), LOREM * 30, fontsize=9)
+            if page_num % 5 == 4:
+                page.set_rotation(90)
+        if page_num % 10 == 0:
+            toc.append([1, f"Section {page_num // 10 + 1}", page_num + 1])
+    doc.set_toc(toc)
+    doc.save(path, deflate=True)
+    doc.close()
+
+
+def make_large_document(path, size_mb, page_mb=1):
+    # Pages of incompressible noise, written in batches so building a
+    # multi-GB file takes little memory
+    from pdf_engine import IncrementalPdf
+    side = int((page_mb * 1024 * 1024 / 3) ** 0.5)
+    document = IncrementalPdf(path, batch_size=64)
+    try:
+        for _ in range(max(1, int(size_mb / page_mb))):
+            pixmap = fitz.Pixmap(fitz.csRGB, side, side, os.urandom(side * side * 3), False)
+            page_doc = fitz.open()
+            page = page_doc.new_page()
+            page.insert_image(page.rect, pixmap=pixmap)
+            document.insert(page_doc)
+            page_doc.close()
+        document.finish()
+    except BaseException:
+        document.abort()
+        raise
+
+
+def build_corpus(root, name, scale=1.0):
+    files, pages, kind = CORPORA[name]
+    files = max(1, int(files * scale))
+    pages = max(1, int(pages * scale)) if name == "huge_files" else pages
+    directory = os.path.join(root, name)
+    os.makedirs(directory, exist_ok=True)
+
+    paths = []
+    for index in range(files):
+        path = os.path.join(directory, f"{name}_{index:04d}.pdf")
+        if not os.path.exists(path):
+            make_document(path, pages, index, kind)
+        paths.append(path)
+    return paths
+
+
+def build_photos(root, scale=1.0):
+    # Mix of JPEG and PNG inputs for convert_to_pdf
+    directory = os.path.join(root, "photos")
+    os.makedirs(directory, exist_ok=True)
+
+    paths = []
+    for index in range(max(1, int(PHOTO_COUNT * scale))):
+        ext = "png" if index % 4 == 0 else "jpg"
+        path = os.path.join(directory, f"photo_{index:04d}.{ext}")
+        if not os.path.exists(path):
+            make_photo(index, size=(620, 877)).save(path)
+        paths.append(path)
+    return paths
@@ -0,0 +1,170 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+from benchmarks.corpus import CORPORA, build_corpus, build_photos
+
+TOOLS = ["merge", "split", "convert", "compress", "extract", "rotate"]
+# Slowdown against the comparison run that counts as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def _run_case(tool, inputs, work_dir):
+    # Runs in a fresh spawned process so peak RSS belongs to this case alone
+    import pdf_engine
+    from pdf_metrics import peak_rss
+
+    baseline_rss = peak_rss()
+    output_dir = tempfile.mkdtemp(dir=work_dir)
+    output = os.path.join(output_dir, "output.pdf")
+
+    start = time.perf_counter()
+    if tool == "merge":
+        result = pdf_engine.merge_pdfs(inputs, output)
+    elif tool == "split":
+        result = pdf_engine.split_pdf(inputs[0], output_dir)
+    elif tool == "convert":
+        result = pdf_engine.convert_to_pdf(inputs, output)
+    elif tool == "compress":
+        result = pdf_engine.compress_pdf(inputs[0], output)
+    elif tool == "extract":
+        result = pdf_engine.extract_images(inputs[0], output_dir)
+    elif tool == "rotate":
+        result = pdf_engine.rotate_pages(inputs[0], output, 90)
+    else:
+        raise ValueError(f"Unknown tool: {tool}")
+    elapsed = time.perf_counter() - start
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    return {
+        "wall_seconds": elapsed,
+        "pages": result.page_count,
+        "input_bytes": sum(os.path.getsize(path) for path in inputs),
+        "baseline_rss": baseline_rss,
+        "peak_rss": peak_rss()
+    }
+
+
+def measure(tool, inputs, work_dir, repeat):
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        with context.Pool(1) as pool:
+            runs.append(pool.apply(_run_case, (tool, inputs, work_dir)))
+
+    best = min(runs, key=lambda run: run["wall_seconds"])
+    seconds = best["wall_seconds"] or 1e-9
+    return {
+        "wall_seconds": seconds,
+        "pages": best["pages"],
+        "input_bytes": best["input_bytes"],
+        "pages_per_sec": best["pages"] / seconds,
+        "mb_per_sec": best["input_bytes"] / (1024 * 1024) / seconds,
+        "peak_rss": max(run["peak_rss"] or 0 for run in runs),
+        "baseline_rss": best["baseline_rss"],
+        "repeat": repeat
+    }
+
+
+def case_inputs(tool, corpus):
+    # Multi-file tools take the whole corpus, the rest its largest file
+    if tool in ("merge", "convert"):
+        return corpus
+    return [max(corpus, key=os.path.getsize)]
+
+
+def environment():
+    info = {"python": platform.python_version(), "platform": platform.platform()}
+    try:
+        info["commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["commit"] = None
+
+    import fitz
+    import img2pdf
+    import PIL
+    import PyPDF2
+    info["versions"] = {
+        "pymupdf": fitz.VersionBind,
+        "pypdf2": PyPDF2.__version__,
+        "img2pdf": img2pdf.__version__,
+        "pillow": PIL.__version__
+    }
+    return info
+
+
+def run(tools, corpora, scale, repeat, corpus_dir=None):
+    work_dir = tempfile.mkdtemp(prefix="pdf_bench_")
+    corpus_root = corpus_dir or os.path.join(work_dir, "corpus")
+    try:
+        results = []
+        for tool in tools:
+            names = ["photos"] if tool == "convert" else corpora
+            for name in names:
+                if name == "photos":
+                    corpus = build_photos(corpus_root, scale)
+                else:
+                    corpus = build_corpus(corpus_root, name, scale)
+                numbers = measure(tool, case_inputs(tool, corpus), work_dir, repeat)
+                results.append({"tool": tool, "corpus": name, **numbers})
+                print(f"{tool:<9} {name:<12} {numbers['wall_seconds']:>8.3f}s "
+                      f"{numbers['pages_per_sec']:>9.0f} p/s {numbers['mb_per_sec']:>8.1f} MB/s")
+        return {"environment": environment(), "scale": scale, "results": results}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare(current, baseline_path, threshold=REGRESSION_THRESHOLD):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(case["tool"], case["corpus"]): case for case in baseline["results"]}
+
+    regressions = 0
+    for case in current["results"]:
+        old = previous.get((case["tool"], case["corpus"]))
+        if not old:
+            continue
+        ratio = case["wall_seconds"] / old["wall_seconds"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{case['tool']:<9} {case['corpus']:<12} {ratio:>6.2f}x time{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Benchmark every PDF tool on synthetic corpora"
+    )
+    parser.add_argument("--tools", nargs="+", choices=TOOLS, default=TOOLS)
+    parser.add_argument("--corpora", nargs="+", choices=list(CORPORA), default=list(CORPORA))
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply corpus sizes, e.g. 0.1 for a quick run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--corpus-dir", help="Keep generated corpora here between runs")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", metavar="JSON", help="Earlier results to compare against")
+    args = parser.parse_args(argv)
+
+    results = run(args.tools, args.corpora, args.scale, args.repeat, args.corpus_dir)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
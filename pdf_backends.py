@@ -0,0 +1,125 @@
+import os
+from contextlib import ExitStack
+import fitz  # PyMuPDF
+from pdf_parallel import report
+from pdf_sources import open_fitz, open_input, source_size
+from pdf_trace import count, span
+
+BACKEND_ENV_VAR = "PDF_MERGER_BACKEND"
+# Backend used for each operation when none is configured. PyMuPDF copies
+# pages in C and is several times faster than PyPDF2 for both.
+AUTO_BACKENDS = {"merge": "pymupdf", "split": "pymupdf"}
+
+
+class PyPDF2Backend:
+    name = "pypdf2"
+
+    def merge(self, inputs, output, progress=None):
+        from PyPDF2 import PdfMerger, PdfReader
+        merger = PdfMerger()
+        # Every input stays mapped until the output is written, since PyPDF2
+        # reads page objects lazily
+        with ExitStack() as opened:
+            try:
+                for index, pdf in enumerate(inputs):
+                    with span("append", input=index):
+                        # A PdfReader is used as is; paths and file objects
+                        # would be copied into memory first
+                        merger.append(PdfReader(opened.enter_context(open_input(pdf))))
+                        count("input_bytes", source_size(pdf))
+                    report(progress, index + 1, len(inputs))
+                page_count = len(merger.pages)
+                with span("write", pages=page_count):
+                    merger.write(output)
+            finally:
+                merger.close()
+        return page_count
+
+    def write_ranges(self, source, jobs, progress=None):
+        # One writer per output so objects shared by its pages are written once
+        from PyPDF2 import PdfReader, PdfWriter
+        with open_input(source) as mapped:
+            pdf = PdfReader(mapped)
+            total = sum(stop - start for start, stop, _ in jobs)
+            done = 0
+            outputs = []
+            for start, stop, output_path in jobs:
+                pdf_writer = PdfWriter()
+                with span("write", pages=stop - start):
+                    for page_num in range(start, stop):
+                        pdf_writer.add_page(pdf.pages[page_num])
+
+                    with open(output_path, "wb") as output_file:
+                        pdf_writer.write(output_file)
+                outputs.append(output_path)
+                done += stop - start
+                report(progress, done, total)
+        return outputs
+
+
+class PyMuPDFBackend:
+    name = "pymupdf"
+
+    def merge(self, inputs, output, progress=None):
+        merged = fitz.open()
+        try:
+            toc = []
+            for index, source in enumerate(inputs):
+                with span("open", input=index) as opened:
+                    src = open_fitz(source)
+                    opened.set("bytes", source_size(source))
+                try:
+                    offset = len(merged)
+                    with span("copy pages", pages=len(src)):
+                        merged.insert_pdf(src)
+                    # insert_pdf does not carry bookmarks over, so rebuild them
+                    toc.extend([level, title, page + offset] for level, title, page in src.get_toc())
+                finally:
+                    src.close()
+                report(progress, index + 1, len(inputs))
+
+            if toc:
+                merged.set_toc(toc)
+            page_count = len(merged)
+            with span("write", pages=page_count):
+                merged.save(output)
+        finally:
+            merged.close()
+        return page_count
+
+    def write_ranges(self, source, jobs, progress=None):
+        src = open_fitz(source)
+        total = sum(stop - start for start, stop, _ in jobs)
+        done = 0
+        outputs = []
+        try:
+            for start, stop, output_path in jobs:
+                out = fitz.open()
+                try:
+                    with span("write", pages=stop - start):
+                        out.insert_pdf(src, from_page=start, to_page=stop - 1)
+                        out.save(output_path)
+                finally:
+                    out.close()
+                outputs.append(output_path)
+                done += stop - start
+                report(progress, done, total)
+        finally:
+            src.close()
+        return outputs
+
+
+BACKENDS = {
+    PyPDF2Backend.name: PyPDF2Backend,
+    PyMuPDFBackend.name: PyMuPDFBackend
+}
+
+
+def get_backend(operation, name=None):
+    # An explicit name wins, then the environment setting, then AUTO_BACKENDS
+    name = (name or os.environ.get(BACKEND_ENV_VAR) or "auto").lower()
+    if name == "auto":
+        name = AUTO_BACKENDS.get(operation, PyPDF2Backend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name}")
+    return BACKENDS[name]()
@@ -0,0 +1,186 @@
+import glob
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import pdf_engine
+from pdf_parallel import report
+
+BATCH_TOOLS = ["split", "convert", "compress", "extract", "rotate", "render"]
+PDF_EXTENSIONS = [".pdf"]
+# Tools whose per-file output is a directory rather than a single PDF
+DIRECTORY_TOOLS = ["split", "extract", "render"]
+
+
+@dataclass
+class BatchResult:
+    tool: str
+    records: list = field(default_factory=list)
+    skipped: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def succeeded(self):
+        return [record for record in self.records if record["status"] == "ok"]
+
+    @property
+    def failed(self):
+        return [record for record in self.records if record["status"] == "error"]
+
+    def summary(self):
+        done = self.succeeded
+        seconds = self.elapsed or 1e-9
+        input_bytes = sum(record["input_bytes"] for record in done)
+        pages = sum(record["pages"] for record in done)
+        return {
+            "tool": self.tool,
+            "succeeded": len(done),
+            "failed": len(self.failed),
+            "skipped": self.skipped,
+            "elapsed_seconds": self.elapsed,
+            "files_per_sec": len(done) / seconds,
+            "pages_per_sec": pages / seconds,
+            "mb_per_sec": input_bytes / (1024 * 1024) / seconds
+        }
+
+    @property
+    def message(self):
+        summary = self.summary()
+        return (f"Processed {summary['succeeded']} file(s), {summary['failed']} failed, "
+                f"{summary['skipped']} skipped ({summary['files_per_sec']:.1f} files/sec)")
+
+
+def input_extensions(tool):
+    return pdf_engine.IMAGE_EXTENSIONS if tool == "convert" else PDF_EXTENSIONS
+
+
+def collect_inputs(specs, extensions, recursive=True):
+    # Expands files, directories and glob patterns into a sorted file list
+    found = set()
+    for spec in specs:
+        if os.path.isdir(spec):
+            pattern = os.path.join(spec, "**", "*") if recursive else os.path.join(spec, "*")
+            candidates = glob.glob(pattern, recursive=recursive)
+        elif os.path.isfile(spec):
+            candidates = [spec]
+        else:
+            candidates = glob.glob(spec, recursive=True)
+        for path in candidates:
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in extensions:
+                found.add(os.path.abspath(path))
+    return sorted(found)
+
+
+def output_for(tool, path, root, output_dir):
+    # Mirrors the input layout under output_dir so equal names never collide
+    relative = os.path.splitext(os.path.relpath(path, root))[0]
+    if tool in DIRECTORY_TOOLS:
+        return os.path.join(output_dir, relative)
+    return os.path.join(output_dir, relative + ".pdf")
+
+
+def run_one(tool, path, output, options):
+    # Worker-process entry point; never raises so one bad file can't stop a batch
+    start = time.perf_counter()
+    record = {"input": path, "output": output, "input_bytes": os.path.getsize(path), "pages": 0}
+    try:
+        if tool in DIRECTORY_TOOLS:
+            os.makedirs(output, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+
+        if tool == "split":
+            result = pdf_engine.split_pdf(path, output, **options)
+        elif tool == "convert":
+            result = pdf_engine.convert_to_pdf([path], output, **options)
+        elif tool == "compress":
+            result = pdf_engine.compress_pdf(path, output, **options)
+        elif tool == "extract":
+            result = pdf_engine.extract_images(path, output, **options)
+        elif tool == "rotate":
+            result = pdf_engine.rotate_pages(path, output, **options)
+        elif tool == "render":
+            result = pdf_engine.render_pages(path, output, **options)
+        else:
+            raise ValueError(f"Unknown batch tool: {tool}")
+    except Exception as e:
+        record.update(status="error", error=str(e))
+    else:
+        record.update(status="ok", pages=result.page_count)
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+def load_checkpoint(checkpoint):
+    # Inputs already processed successfully by an earlier, interrupted run
+    done = set()
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash can leave a torn last line
+                    continue
+                if record.get("status") == "ok":
+                    done.add(record["input"])
+    return done
+
+
+def run_batch(tool, inputs, output_dir, options=None, workers=1, checkpoint=None, progress=None):
+    if tool not in BATCH_TOOLS:
+        raise ValueError(f"Unknown batch tool: {tool}")
+    options = options or {}
+    inputs = [os.path.abspath(path) for path in inputs]
+    if not inputs:
+        raise ValueError("No input files found")
+
+    finished = load_checkpoint(checkpoint)
+    pending = [path for path in inputs if path not in finished]
+    root = os.path.commonpath([os.path.dirname(path) for path in inputs])
+    result = BatchResult(tool, skipped=len(inputs) - len(pending))
+
+    start = time.perf_counter()
+    log = open(checkpoint, "a") if checkpoint else None
+    try:
+        for record in _run_records(tool, pending, root, output_dir, options, workers):
+            result.records.append(record)
+            if log:
+                # One line per file, flushed at once so a crash loses nothing
+                log.write(json.dumps(record) + "\n")
+                log.flush()
+            report(progress, len(result.records), len(pending))
+    finally:
+        if log:
+            log.close()
+        result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _run_records(tool, paths, root, output_dir, options, workers):
+    if workers <= 1:
+        for path in paths:
+            yield run_one(tool, path, output_for(tool, path, root, output_dir), options)
+        return
+
+    # Submit through a bounded window so a 40k-file batch doesn't queue
+    # 40k futures and cancelling stays prompt
+    queue = iter(paths)
+    running = set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            while True:
+                for path in queue:
+                    running.add(pool.submit(run_one, tool, path, output_for(tool, path, root, output_dir), options))
+                    if len(running) >= workers * 2:
+                        break
+                if not running:
+                    return
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
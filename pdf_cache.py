@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from pdf_registry import content_hash
+from pdf_sources import is_path
+
+CACHE_ENV_VAR = "PDF_MERGER_CACHE_DIR"
+CACHE_SIZE_ENV_VAR = "PDF_MERGER_CACHE_MB"
+DEFAULT_MAX_MB = 1024
+# Outputs bigger than this share of the cache are not stored; copying one
+# in would only evict most other entries, or the output itself, again
+MAX_ENTRY_SHARE = 0.25
+# Bump when the engine's output for the same inputs and parameters changes
+CACHE_VERSION = 1
+
+
+def user_cache_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pdf_merger")
+
+
+def default_cache_dir():
+    return os.environ.get(CACHE_ENV_VAR) or os.path.join(user_cache_dir(), "results")
+
+
+def default_max_bytes():
+    return int(float(os.environ.get(CACHE_SIZE_ENV_VAR) or DEFAULT_MAX_MB) * 1024 * 1024)
+
+
+class ResultCache:
+    # Finished single-file outputs keyed by the inputs' content hashes plus
+    # the operation and the parameters that affect its output. A hit copies
+    # (or, with link=True, hardlinks) the stored file to the requested output.
+    # Entries are evicted least recently used first once the cache outgrows
+    # max_bytes.
+    def __init__(self, cache_dir=None, max_bytes=None, link=False):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = default_max_bytes() if max_bytes is None else max_bytes
+        # Hardlinked outputs share storage with the cache, so editing one in
+        # place would corrupt the cached copy; only link read-only outputs
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        self._hashes = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, operation, inputs, params):
+        digest = hashlib.sha256()
+        digest.update(json.dumps([CACHE_VERSION, operation, params], sort_keys=True, default=str).encode())
+        for path in inputs:
+            digest.update(self._input_hash(path).encode())
+        return digest.hexdigest()
+
+    def run(self, operation, func, source, output, params=None, progress=None, **options):
+        # Calls func(source, output, **params, **options) unless an identical
+        # run is cached. options must not change the output (workers, streaming).
+        params = params or {}
+        inputs = source if isinstance(source, (list, tuple)) else [source]
+        if not is_path(output) or not all(is_path(path) for path in inputs):
+            # Streams have no stable identity to key on
+            return func(source, output, progress=progress, **params, **options)
+
+        key = self.key(operation, inputs, params)
+        result = self.lookup(key, output)
+        if result is not None:
+            return result
+
+        result = func(source, output, progress=progress, **params, **options)
+        with self._lock:
+            self.misses += 1
+        self.store(key, result)
+        result.stats["cache"] = "miss"
+        return result
+
+    def lookup(self, key, output):
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            part_path = os.fspath(output) + ".part"
+            if self.link:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                os.link(data_path, part_path)
+            else:
+                shutil.copyfile(data_path, part_path)
+            os.replace(part_path, output)
+            # Mark as recently used for eviction
+            os.utime(data_path)
+        except (OSError, ValueError):
+            return None
+
+        from pdf_engine import OperationResult
+        with self._lock:
+            self.hits += 1
+        stats = dict(meta["stats"], cache="hit")
+        return OperationResult(meta["operation"], outputs=[output], page_count=meta["page_count"],
+                               message=meta["message"], stats=stats)
+
+    def store(self, key, result):
+        if len(result.outputs) != 1:
+            return
+        data_path, meta_path = self._paths(key)
+        try:
+            if os.path.getsize(result.outputs[0]) > self.max_bytes * MAX_ENTRY_SHARE:
+                return
+            shutil.copyfile(result.outputs[0], data_path + ".part")
+            os.replace(data_path + ".part", data_path)
+            with open(meta_path, "w") as f:
+                json.dump({
+                    "operation": result.operation,
+                    "page_count": result.page_count,
+                    "message": result.message,
+                    "stats": result.stats
+                }, f, default=str)
+        except OSError as e:
+            print(f"Failed to cache result: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pdf"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name[:-4]))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+
+    def summary(self):
+        return f"cache: {self.hits} hit(s), {self.misses} miss(es)"
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".pdf", base + ".json"
+
+    def _input_hash(self, path):
+        # Hashes are reused while a file's size and mtime stay the same
+        stat = os.stat(path)
+        stamp = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        if stamp not in self._hashes:
+            self._hashes[stamp] = content_hash(path)
+        return self._hashes[stamp]
@@ -0,0 +1,310 @@
+import hashlib
+import io
+import re
+import zlib
+from dataclasses import dataclass, replace
+
+from pdf_parallel import ordered_map, report
+
+COLOR_MODES = ["keep", "gray", "bilevel"]
+# Only re-encode an image when it shrinks by at least this much
+MIN_SAVING = 0.9
+# Images within this factor of the target DPI are left alone
+DPI_TOLERANCE = 1.1
+REFERENCE = re.compile(r"\b(\d+) \d+ R\b")
+
+
+@dataclass
+class CompressionOptions:
+    dpi: int = None
+    jpeg_quality: int = None
+    color: str = "keep"
+    subset_fonts: bool = False
+
+    @property
+    def touches_images(self):
+        return self.dpi is not None or self.jpeg_quality is not None or self.color != "keep"
+
+
+PRESETS = {
+    "lossless": CompressionOptions(),
+    "print": CompressionOptions(dpi=300, jpeg_quality=85, subset_fonts=True),
+    "ebook": CompressionOptions(dpi=150, jpeg_quality=70, subset_fonts=True),
+    "screen": CompressionOptions(dpi=72, jpeg_quality=50, subset_fonts=True)
+}
+
+
+def resolve_options(preset=None, **overrides):
+    if preset not in (None, *PRESETS):
+        raise ValueError(f"Unknown compression preset: {preset}")
+    options = replace(PRESETS[preset or "lossless"], **{k: v for k, v in overrides.items() if v is not None})
+    if options.color not in COLOR_MODES:
+        raise ValueError(f"Unknown color mode: {options.color}")
+    return options
+
+
+def classify(doc, xref, content_xrefs):
+    if xref in content_xrefs:
+        return "content"
+    if not doc.xref_is_stream(xref):
+        return "objects"
+    if doc.xref_get_key(xref, "Subtype")[1] == "/Image":
+        return "images"
+    # Object and cross-reference streams also carry /N, so catch them first
+    if doc.xref_get_key(xref, "Type")[1] in ("/ObjStm", "/XRef"):
+        return "objects"
+    # ICC profiles carry a component count and nothing else identifying
+    if doc.xref_get_key(xref, "N")[0] != "null" and doc.xref_get_key(xref, "FunctionType")[0] == "null":
+        return "color profiles"
+    # Embedded font programs carry /Length1..3 or a compact font subtype
+    if doc.xref_get_key(xref, "Length1")[0] != "null" or doc.xref_get_key(xref, "Subtype")[1] in (
+            "/Type1C", "/CIDFontType0C", "/OpenType"):
+        return "fonts"
+    return "other streams"
+
+
+def object_sizes(doc):
+    # Bytes per object class, as stored (compressed) in the file
+    content_xrefs = {xref for page in doc for xref in page.get_contents()}
+    sizes = {}
+    for xref in range(1, doc.xref_length()):
+        try:
+            kind = classify(doc, xref, content_xrefs)
+            size = len(doc.xref_object(xref, compressed=True))
+            if doc.xref_is_stream(xref):
+                size += len(doc.xref_stream_raw(xref))
+        except RuntimeError:
+            # Free or broken xref entries
+            continue
+        sizes[kind] = sizes.get(kind, 0) + size
+    return sizes
+
+
+def _object_digest(doc, xref, digests, pending):
+    # Hash of an object with each indirect reference replaced by the hash of
+    # the object it points to, so two copies of a logo that point at their
+    # own copies of a color space or soft mask hash the same
+    if xref in digests:
+        return digests[xref]
+    if xref in pending:
+        # Back-references keep their number and so never match
+        return f"cycle {xref}"
+    try:
+        if doc.xref_get_key(xref, "Type")[1] in ("/Page", "/Pages"):
+            # Pages are never merged, and following /Parent would pull in the whole tree
+            return f"page {xref}"
+        source = doc.xref_object(xref, compressed=True)
+        pending.add(xref)
+        try:
+            resolved = REFERENCE.sub(lambda m: _object_digest(doc, int(m.group(1)), digests, pending), source)
+        finally:
+            pending.discard(xref)
+        digest = hashlib.sha256(resolved.encode())
+        if doc.xref_is_stream(xref):
+            digest.update(b"\0" + doc.xref_stream_raw(xref))
+    except (RuntimeError, ValueError, RecursionError):
+        # Free, broken or very deeply nested objects
+        return f"xref {xref}"
+    digests[xref] = digest.hexdigest()
+    return digests[xref]
+
+
+def duplicate_streams(doc):
+    # Streams whose dictionary, encoded bytes and referenced objects repeat
+    # an earlier stream, such as the same font or logo embedded by every
+    # merged input. These are what garbage=4 merges.
+    # Returns {class: {"duplicates": count, "bytes": stream bytes}}.
+    content_xrefs = None
+    digests = {}
+    seen = set()
+    duplicates = {}
+    for xref in range(1, doc.xref_length()):
+        try:
+            if not doc.xref_is_stream(xref):
+                continue
+            digest = _object_digest(doc, xref, digests, set())
+            if digest not in seen:
+                seen.add(digest)
+                continue
+            if content_xrefs is None:
+                content_xrefs = {xref for page in doc for xref in page.get_contents()}
+            kind = classify(doc, xref, content_xrefs)
+            size = len(doc.xref_stream_raw(xref))
+        except RuntimeError:
+            continue
+        entry = duplicates.setdefault(kind, {"duplicates": 0, "bytes": 0})
+        entry["duplicates"] += 1
+        entry["bytes"] += size
+    return duplicates
+
+
+def savings_report(before, after):
+    return {
+        kind: {"before": before.get(kind, 0), "after": after.get(kind, 0),
+               "saved": before.get(kind, 0) - after.get(kind, 0)}
+        for kind in sorted(set(before) | set(after))
+    }
+
+
+def _image_scales(doc, target_dpi):
+    # Downscale factor per image xref, based on the largest size it is drawn at
+    scales = {}
+    for page in doc:
+        for info in page.get_image_info(xrefs=True):
+            xref = info.get("xref")
+            if not xref:
+                continue
+            width_inches = (info["bbox"][2] - info["bbox"][0]) / 72
+            if width_inches <= 0 or not target_dpi:
+                scale = 1.0
+            else:
+                dpi = info["width"] / width_inches
+                scale = target_dpi / dpi if dpi > target_dpi * DPI_TOLERANCE else 1.0
+            scales[xref] = max(scales.get(xref, 0.0), min(scale, 1.0))
+    return scales
+
+
+def stored_size(raw, filtered):
+    # Bytes an image stream takes in the saved file. Unfiltered streams are
+    # deflated on save, so they are measured deflated too.
+    return len(raw) if filtered else len(zlib.compress(raw))
+
+
+def recompress_image(task):
+    # Worker-process entry point. task is (xref, image bytes, stored stream,
+    # whether it is filtered, scale, options). Returns (xref, JPEG bytes,
+    # None), (xref, deflated 1-bit rows, (width, height)) for bilevel output,
+    # or (xref, None, None) when re-encoding does not pay off against the
+    # stored stream.
+    from PIL import Image
+    xref, data, raw, filtered, scale, options = task
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except OSError:
+        # Formats Pillow cannot decode (JBIG2, some JPX) are kept as they are
+        return xref, None, None
+
+    with image:
+        if scale < 1.0:
+            size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+            image = image.resize(size, Image.LANCZOS)
+
+        if options.color == "gray":
+            image = image.convert("L")
+        elif options.color == "bilevel":
+            image = image.convert("L").convert("1")
+        elif image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+        # Pillow would embed the source's profile in every new image, and it
+        # no longer fits after a gray conversion; recompress_images keeps
+        # the original color space object instead
+        image.info.pop("icc_profile", None)
+
+        if image.mode == "1":
+            # Pillow packs 1-bit rows the way PDF does, white as 1
+            new_data, bilevel_size = zlib.compress(image.tobytes(), 9), image.size
+        else:
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=options.jpeg_quality or 85, optimize=True)
+            new_data, bilevel_size = buffer.getvalue(), None
+
+    if len(new_data) >= stored_size(raw, filtered) * MIN_SAVING:
+        return xref, None, None
+    return xref, new_data, bilevel_size
+
+
+def _image_owners(doc):
+    # First page each image appears on, skipping masked images, which would
+    # lose their transparency when re-encoded
+    owners = {}
+    for page in doc:
+        for image in page.get_images():
+            xref = image[0]
+            if xref in owners:
+                continue
+            if doc.xref_get_key(xref, "SMask")[0] != "null" or doc.xref_get_key(xref, "ImageMask")[1] == "true":
+                continue
+            owners[xref] = page.number
+    return owners
+
+
+def _image_tasks(doc, owners, options):
+    # Generated lazily so only the images in flight are held in memory
+    scales = _image_scales(doc, options.dpi)
+    for xref in owners:
+        base_image = doc.extract_image(xref)
+        if base_image:
+            filtered = doc.xref_get_key(xref, "Filter")[0] != "null"
+            yield xref, base_image["image"], doc.xref_stream_raw(xref), filtered, scales.get(xref, 1.0), options
+
+
+DEVICE_SPACES = {1: "/DeviceGray", 3: "/DeviceRGB"}
+ICC_REFERENCE = re.compile(r"\[\s*/ICCBased\s+(\d+) \d+ R\s*\]")
+
+
+def colorspace_components(doc, colorspace):
+    # Component count of an xref_get_key("ColorSpace") value when it is a
+    # device RGB or gray space or an ICC profile, otherwise None
+    kind, value = colorspace
+    if kind == "name":
+        return {space: components for components, space in DEVICE_SPACES.items()}.get(value)
+    if kind == "xref":
+        value = doc.xref_object(int(value.split()[0]), compressed=True)
+    match = ICC_REFERENCE.fullmatch(value.strip())
+    if match:
+        components = doc.xref_get_key(int(match.group(1)), "N")[1]
+        return int(components) if components.isdigit() else None
+    return None
+
+
+def _keep_colorspace(doc, xref, original):
+    # MuPDF gives each inserted JPEG its default ICC profile. A replaced
+    # image points back at its original color space instead, or at the
+    # matching device space after a color change, so compressing never
+    # adds profiles to the file.
+    components = colorspace_components(doc, doc.xref_get_key(xref, "ColorSpace"))
+    if components and components == colorspace_components(doc, original):
+        doc.xref_set_key(xref, "ColorSpace", original[1])
+    elif components in DEVICE_SPACES:
+        doc.xref_set_key(xref, "ColorSpace", DEVICE_SPACES[components])
+
+
+def _write_bilevel(doc, xref, data, width, height):
+    # Stores deflated 1-bit rows as the image stream. replace_image would
+    # let MuPDF re-encode them as CCITT G4, which comes out about twice the
+    # size of deflate for downsampled scans.
+    doc.update_stream(xref, data, compress=False)
+    for key, value in (("Filter", "/FlateDecode"), ("DecodeParms", "null"), ("Decode", "null"),
+                       ("Width", str(width)), ("Height", str(height)), ("BitsPerComponent", "1"),
+                       ("ColorSpace", "/DeviceGray")):
+        doc.xref_set_key(xref, key, value)
+
+
+def recompress_images(doc, options, workers=1, progress=None):
+    # Returns (images re-encoded, images examined)
+    owners = _image_owners(doc)
+    tasks = _image_tasks(doc, owners, options)
+    results = ordered_map(recompress_image, tasks, workers) if workers > 1 else map(recompress_image, tasks)
+
+    replaced = 0
+    for index, (xref, new_data, bilevel_size) in enumerate(results):
+        if bilevel_size:
+            _write_bilevel(doc, xref, new_data, *bilevel_size)
+            replaced += 1
+        elif new_data is not None:
+            colorspace = doc.xref_get_key(xref, "ColorSpace")
+            doc[owners[xref]].replace_image(xref, stream=new_data)
+            _keep_colorspace(doc, xref, colorspace)
+            replaced += 1
+        report(progress, index + 1, len(owners))
+    return replaced, len(owners)
+
+
+def subset_fonts(doc):
+    # Needs fontTools; returns False when subsetting is unavailable
+    try:
+        doc.subset_fonts()
+    except (ImportError, RuntimeError, ValueError):
+        return False
+    return True
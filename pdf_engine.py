@@ -0,0 +1,1007 @@
+import io
+import json
+import math
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+import fitz  # PyMuPDF
+import pdf_compress
+import pdf_render
+from pdf_backends import get_backend
+from pdf_metrics import format_size, peak_rss
+from pdf_parallel import ordered_map, report, run_shards, shard_items
+from pdf_sources import is_path, source_size, source_stem, open_fitz, open_input
+from pdf_trace import count, span, traced
+
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.bmp', '.tiff']
+ROTATION_ANGLES = [90, 180, 270]
+SPLIT_MODES = ["page", "every", "ranges", "bookmarks", "size"]
+# How extract_images handles images repeated on several pages
+DUPLICATE_MODES = ["hardlink", "copy", "manifest"]
+MANIFEST_NAME = "manifest.json"
+# Inputs merged between incremental flushes in streaming merge mode
+STREAM_BATCH_SIZE = 16
+# Drops unused and duplicate objects and recompresses streams on save
+COMPRESS_SAVE_OPTIONS = {"garbage": 4, "deflate": True, "clean": True}
+# Rough per-page cost of the page dictionary and xref entries
+PAGE_OVERHEAD_BYTES = 512
+
+
+@dataclass
+class OperationResult:
+    operation: str
+    outputs: list = field(default_factory=list)
+    page_count: int = 0
+    message: str = ""
+    stats: dict = field(default_factory=dict)
+
+
+@traced("merge")
+def merge_pdfs(inputs, output, page_ranges=None, streaming=False, batch_size=STREAM_BATCH_SIZE, backend=None,
+               dedupe=False, progress=None):
+    # page_ranges holds one page spec per input ("1-3,7"), or None for all pages.
+    # dedupe stores fonts, images and color profiles repeated across inputs once.
+    if not inputs:
+        raise ValueError("Please select PDF files first")
+    if dedupe and streaming and not is_path(output):
+        raise ValueError("Deduplication needs a file path as output")
+
+    if page_ranges and any(page_ranges):
+        result = compose_pdfs(list(zip(inputs, page_ranges)), output, dedupe=dedupe, progress=progress)
+    elif streaming:
+        result = stream_merge_pdfs(inputs, output, batch_size=batch_size, dedupe=dedupe, progress=progress)
+    elif dedupe:
+        # Deduplication needs MuPDF's garbage=4, so the merge is built in
+        # memory with PyMuPDF and written once whatever the backend
+        result = compose_pdfs([(source, None) for source in inputs], output, dedupe=True, progress=progress)
+    else:
+        merge_backend = get_backend("merge", backend)
+        page_count = merge_backend.merge(inputs, output, progress=progress)
+        result = OperationResult(
+            "merge",
+            outputs=[output],
+            page_count=page_count,
+            message="PDFs merged successfully",
+            stats={"input_files": len(inputs), "backend": merge_backend.name, "peak_rss": peak_rss()}
+        )
+
+    if dedupe:
+        result.message = f"PDFs merged successfully ({format_size(result.stats['dedupe']['bytes_saved'])} deduplicated)"
+    return result
+
+
+def find_duplicates(doc):
+    # Hashes the streams of an open document before it is saved with
+    # garbage=4, which is what actually stores each duplicate once.
+    # save_deduped completes the report once the output is written.
+    start = time.perf_counter()
+    with span("hash streams") as hashed:
+        duplicates = pdf_compress.duplicate_streams(doc)
+        hashed.set("duplicates", sum(entry["duplicates"] for entry in duplicates.values()))
+    return {
+        "duplicates_by_class": duplicates,
+        "bytes_saved": sum(entry["bytes"] for entry in duplicates.values()),
+        "hash_seconds": time.perf_counter() - start
+    }
+
+
+def save_deduped(doc, output, **save_options):
+    report = find_duplicates(doc)
+    start = time.perf_counter()
+    with span("write", garbage=4):
+        doc.save(output, garbage=4, **save_options)
+    # size_before is what the output would have been with the duplicates kept
+    report["size_after"] = source_size(output)
+    report["size_before"] = report["size_after"] + report["bytes_saved"]
+    report["seconds"] = report["hash_seconds"] + time.perf_counter() - start
+    return report
+
+
+class IncrementalPdf:
+    # Builds a PDF on disk in batches. Pending pages are appended to a .part
+    # file with an incremental save and the file is reopened, so MuPDF loads
+    # earlier pages lazily instead of keeping them all in memory. The .part
+    # file replaces the output only once everything has been written.
+    def __init__(self, output, batch_size=STREAM_BATCH_SIZE):
+        if not is_path(output):
+            raise ValueError("Streaming output needs a file path")
+        self.output = output
+        self.part_path = os.fspath(output) + ".part"
+        self.batch_size = max(1, int(batch_size))
+        self.doc = fitz.open()
+        self._saved = False
+        self._pending = 0
+
+    def __len__(self):
+        return len(self.doc)
+
+    def insert(self, src):
+        self.doc.insert_pdf(src)
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        with span("write", incremental=self._saved):
+            if self._saved:
+                self.doc.saveIncr()
+            else:
+                self.doc.save(self.part_path)
+            self.doc.close()
+            self.doc = fitz.open(self.part_path)
+        self._saved = True
+        self._pending = 0
+
+    def finish(self, toc=None, dedupe=False):
+        # With dedupe the batches already on disk are written out once more,
+        # with garbage=4, straight to the output; returns the dedupe report
+        self.flush()
+        if toc:
+            self.doc.set_toc(toc)
+            if not dedupe:
+                self.doc.saveIncr()
+        if not dedupe:
+            self.doc.close()
+            os.replace(self.part_path, self.output)
+            return None
+        deduped_path = self.part_path + ".dedupe"
+        try:
+            deduped = save_deduped(self.doc, deduped_path)
+        except BaseException:
+            if os.path.exists(deduped_path):
+                os.remove(deduped_path)
+            raise
+        finally:
+            self.doc.close()
+        os.replace(deduped_path, self.output)
+        os.remove(self.part_path)
+        return deduped
+
+    def abort(self):
+        self.doc.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+def stream_merge_pdfs(inputs, output, batch_size=STREAM_BATCH_SIZE, dedupe=False, progress=None):
+    # Memory is bounded by the largest single input plus one batch of
+    # pending objects, rather than the total size of all inputs
+    if not inputs:
+        raise ValueError("Please select PDF files first")
+
+    merged = IncrementalPdf(output, batch_size)
+    toc = []
+    try:
+        for index, source in enumerate(inputs):
+            with span("open", input=index) as opened:
+                src = open_fitz(source)
+                opened.set("bytes", source_size(source))
+            try:
+                offset = len(merged)
+                with span("copy pages", pages=len(src)):
+                    merged.insert(src)
+                toc.extend([level, title, page + offset] for level, title, page in src.get_toc())
+            finally:
+                src.close()
+            report(progress, index + 1, len(inputs))
+
+        page_count = len(merged)
+        deduped = merged.finish(toc, dedupe=dedupe)
+    except BaseException:
+        merged.abort()
+        raise
+
+    stats = {
+        "input_files": len(inputs),
+        "streaming": True,
+        "backend": "pymupdf",
+        "batch_size": merged.batch_size,
+        "peak_rss": peak_rss()
+    }
+    if deduped:
+        stats["dedupe"] = deduped
+    return OperationResult(
+        "merge",
+        outputs=[output],
+        page_count=page_count,
+        message="PDFs merged successfully",
+        stats=stats
+    )
+
+
+def parse_page_ranges(spec, num_pages):
+    # "1-10,11-40,41-" -> [(0, 10), (10, 40), (40, num_pages)]
+    ranges = []
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                first, last = part.split("-", 1)
+                first = int(first) if first else 1
+                last = int(last) if last else num_pages
+            else:
+                first = last = int(part)
+        except ValueError:
+            raise ValueError(f"Invalid page range: {part}")
+        if not 1 <= first <= last <= num_pages:
+            raise ValueError(f"Invalid page range: {part} (document has {num_pages} pages)")
+        ranges.append((first - 1, last))
+
+    if not ranges:
+        raise ValueError("No page ranges given")
+    return ranges
+
+
+def merge_part(arg):
+    # "file.pdf@1-3,7" -> ("file.pdf", "1-3,7"); a real file named with @ wins
+    if "@" in arg and not os.path.exists(arg):
+        path, spec = arg.rsplit("@", 1)
+        return path, spec
+    return arg, None
+
+
+def _source_key(source):
+    return os.path.abspath(source) if is_path(source) else id(source)
+
+
+def _range_toc(toc, start, stop, offset):
+    # Bookmarks pointing into pages [start, stop), moved to where those pages land
+    return [[level, title, page - start + offset] for level, title, page in toc if start < page <= stop]
+
+
+def _normalise_toc(toc):
+    # Dropping pages can orphan nested bookmarks; set_toc needs the first
+    # entry at level 1 and no level deeper than its parent + 1
+    previous = 0
+    for entry in toc:
+        entry[0] = min(entry[0], previous + 1)
+        previous = entry[0]
+    return toc
+
+
+def insert_parts(composed, parts, sources, progress=None):
+    # Appends parts, (source, page spec) pairs, to the open document
+    # composed; a spec of None takes every page and an image file becomes
+    # one page. Each source is opened and parsed once however many parts
+    # use it, and MuPDF copies its shared fonts and images once. Opened
+    # sources are kept in sources for the caller to close.
+    toc = composed.get_toc()
+    for index, (source, spec) in enumerate(parts):
+        if is_path(source) and Path(source).suffix.lower() in IMAGE_EXTENSIONS:
+            with span("convert image", part=index):
+                page_pdf = fitz.open(stream=_image_file_pdf(source), filetype="pdf")
+                try:
+                    composed.insert_pdf(page_pdf)
+                finally:
+                    page_pdf.close()
+            report(progress, index + 1, len(parts))
+            continue
+
+        key = _source_key(source)
+        if key not in sources:
+            with span("open", input=len(sources)) as opened:
+                doc = open_fitz(source)
+                sources[key] = (doc, doc.get_toc())
+                opened.set("bytes", source_size(source))
+        src, src_toc = sources[key]
+
+        ranges = parse_page_ranges(spec, len(src)) if spec else [(0, len(src))]
+        with span("copy pages", part=index) as copied:
+            for start, stop in ranges:
+                offset = len(composed)
+                composed.insert_pdf(src, from_page=start, to_page=stop - 1)
+                toc.extend(_range_toc(src_toc, start, stop, offset))
+                copied.add("pages", stop - start)
+        report(progress, index + 1, len(parts))
+
+    if toc:
+        composed.set_toc(_normalise_toc(toc))
+
+
+def compose_pdfs(parts, output, dedupe=False, progress=None):
+    # parts are (source, page spec) pairs in output order; see insert_parts
+    if not parts:
+        raise ValueError("Please select PDF files first")
+
+    sources = {}
+    deduped = None
+    composed = fitz.open()
+    try:
+        insert_parts(composed, parts, sources, progress)
+        page_count = len(composed)
+        if dedupe:
+            deduped = save_deduped(composed, output)
+        else:
+            with span("write", pages=page_count):
+                composed.save(output)
+    finally:
+        composed.close()
+        for doc, _ in sources.values():
+            doc.close()
+
+    stats = {"input_files": len(sources), "parts": len(parts), "backend": "pymupdf", "peak_rss": peak_rss()}
+    if deduped:
+        stats["dedupe"] = deduped
+    return OperationResult(
+        "merge",
+        outputs=[output],
+        page_count=page_count,
+        message="PDFs merged successfully",
+        stats=stats
+    )
+
+
+def _chunk_ranges(num_pages, pages_per_file):
+    pages_per_file = int(pages_per_file)
+    if pages_per_file < 1:
+        raise ValueError("Pages per file must be at least 1")
+    return [(start, min(start + pages_per_file, num_pages)) for start in range(0, num_pages, pages_per_file)]
+
+
+def _starts_to_ranges(starts, num_pages):
+    starts = sorted(set(starts) | {0})
+    return [(start, stop) for start, stop in zip(starts, starts[1:] + [num_pages]) if start < stop]
+
+
+def _outline_ranges(pdf, level):
+    # Split before every bookmark at or above the given outline level
+    level = int(level)
+    starts = []
+
+    def walk(items, depth):
+        for item in items:
+            if isinstance(item, list):
+                walk(item, depth + 1)
+            elif depth <= level:
+                page_num = pdf.get_destination_page_number(item)
+                if page_num is not None and page_num >= 0:
+                    starts.append(page_num)
+
+    walk(pdf.outline, 1)
+    if not starts:
+        raise ValueError("PDF has no bookmarks to split on")
+    return _starts_to_ranges(starts, len(pdf.pages))
+
+
+def _page_streams(page):
+    # Encoded size of every indirect object a page draws on, keyed by reference
+    from PyPDF2.generic import IndirectObject
+    streams = {}
+    stack = [page.get("/Contents"), page.get("/Resources")]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, IndirectObject):
+            key = (obj.idnum, obj.generation)
+            if key in streams:
+                continue
+            obj = obj.get_object()
+            streams[key] = len(getattr(obj, "_data", None) or b"")
+        if isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, list):
+            stack.extend(obj)
+    return streams
+
+
+def _size_ranges(pdf, max_mb):
+    # Greedy packing on estimated output size. Shared fonts and images are
+    # only counted once per output, matching how the writer stores them.
+    limit = float(max_mb) * 1024 * 1024
+    if limit <= 0:
+        raise ValueError("Target size must be greater than 0 MB")
+
+    starts = []
+    chunk_streams = set()
+    chunk_size = 0
+    for page_num, page in enumerate(pdf.pages):
+        streams = _page_streams(page)
+        added = PAGE_OVERHEAD_BYTES + sum(size for key, size in streams.items() if key not in chunk_streams)
+        if not starts or chunk_size + added > limit:
+            starts.append(page_num)
+            chunk_streams = set()
+            chunk_size = PAGE_OVERHEAD_BYTES + sum(streams.values())
+        else:
+            chunk_size += added
+        chunk_streams.update(streams)
+    return _starts_to_ranges(starts, len(pdf.pages))
+
+
+def split_ranges(pdf, mode="page", value=None):
+    num_pages = len(pdf.pages)
+    if mode == "page":
+        return [(page_num, page_num + 1) for page_num in range(num_pages)]
+    if mode == "every":
+        return _chunk_ranges(num_pages, value)
+    if mode == "ranges":
+        return parse_page_ranges(value, num_pages)
+    if mode == "bookmarks":
+        return _outline_ranges(pdf, value or 1)
+    if mode == "size":
+        return _size_ranges(pdf, value)
+    raise ValueError(f"Unknown split mode: {mode}")
+
+
+def _split_output_path(output_dir, base_name, mode, start, stop):
+    if mode == "page" or stop - start == 1:
+        return os.path.join(output_dir, f"{base_name}_page_{start + 1}.pdf")
+    return os.path.join(output_dir, f"{base_name}_pages_{start + 1}-{stop}.pdf")
+
+
+def _write_shard(backend_name, source, jobs):
+    # Worker-process entry point: each worker opens the source once
+    return get_backend("split", backend_name).write_ranges(source, jobs)
+
+
+@traced("split")
+def split_pdf(source, output_dir, stem=None, mode="page", value=None, workers=1, backend=None, progress=None):
+    from PyPDF2 import PdfReader
+    with span("parse", mode=mode) as parsed, open_input(source) as mapped:
+        pdf = PdfReader(mapped)
+        num_pages = len(pdf.pages)
+        base_name = stem or source_stem(source)
+        jobs = [
+            (start, stop, _split_output_path(output_dir, base_name, mode, start, stop))
+            for start, stop in split_ranges(pdf, mode, value)
+        ]
+        parsed.set("pages", num_pages)
+        parsed.set("outputs", len(jobs))
+
+    split_backend = get_backend("split", backend)
+
+    # Only paths can be reopened by worker processes
+    if workers > 1 and len(jobs) > 1 and is_path(source):
+        outputs = _split_parallel(split_backend.name, source, jobs, workers, progress)
+    else:
+        outputs = split_backend.write_ranges(source, jobs, progress=progress)
+
+    if mode == "page":
+        message = f"PDF split into {num_pages} pages"
+    else:
+        message = f"PDF split into {len(outputs)} files"
+
+    return OperationResult(
+        "split",
+        outputs=outputs,
+        page_count=num_pages,
+        message=message,
+        stats={"mode": mode, "files": len(outputs), "workers": workers, "backend": split_backend.name}
+    )
+
+
+def _split_parallel(backend_name, source, jobs, workers, progress):
+    tasks = [
+        ((backend_name, os.fspath(source), shard), sum(stop - start for start, stop, _ in shard))
+        for shard in shard_items(jobs, workers)
+    ]
+    return [path for shard_outputs in run_shards(_write_shard, tasks, workers, progress) for path in shard_outputs]
+
+
+def _image_pdf(data):
+    # One-page PDF for a single image. img2pdf embeds JPEGs without
+    # re-encoding; images it rejects (alpha channels, BMP, odd TIFFs) are
+    # normalised with Pillow first.
+    import img2pdf
+    from PIL import Image, ImageOps
+    try:
+        return img2pdf.convert(data)
+    except (img2pdf.AlphaChannelError, img2pdf.ImageOpenError, ValueError):
+        pass
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode not in ("RGB", "L", "CMYK"):
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+    return img2pdf.convert(buffer.getvalue())
+
+
+def _image_file_pdf(path):
+    # Worker-process entry point
+    with open(path, 'rb') as img_file:
+        return _image_pdf(img_file.read())
+
+
+def _convertible(image):
+    return not is_path(image) or Path(image).suffix.lower() in IMAGE_EXTENSIONS
+
+
+def _image_pages(images, workers):
+    # Yields one-page PDFs in input order. With workers, at most a small
+    # window of converted pages is held in memory at once.
+    if workers <= 1 or not all(is_path(image) for image in images):
+        for image in images:
+            if is_path(image):
+                yield _image_file_pdf(image)
+            else:
+                yield _image_pdf(image.read())
+        return
+
+    yield from ordered_map(_image_file_pdf, [os.fspath(image) for image in images], workers)
+
+
+def stream_convert_to_pdf(images, output, workers=1, batch_size=STREAM_BATCH_SIZE, progress=None):
+    # Pages are written to disk as they are converted, so memory stays
+    # bounded by the conversion window rather than the number of images
+    images = [image for image in images if _convertible(image)]
+    if not images:
+        raise ValueError("No valid image files selected")
+
+    converted = IncrementalPdf(output, batch_size)
+    try:
+        for index, page_pdf in enumerate(_image_pages(images, workers)):
+            count("image_pdf_bytes", len(page_pdf))
+            src = fitz.open(stream=page_pdf, filetype="pdf")
+            try:
+                converted.insert(src)
+            finally:
+                src.close()
+            report(progress, index + 1, len(images))
+
+        page_count = len(converted)
+        converted.finish()
+    except BaseException:
+        converted.abort()
+        raise
+
+    return OperationResult(
+        "convert",
+        outputs=[output],
+        page_count=page_count,
+        message="Images converted to PDF successfully",
+        stats={"streaming": True, "workers": workers, "peak_rss": peak_rss()}
+    )
+
+
+def insert_images(doc, images, workers=1, progress=None):
+    # Appends one page per image to an open document, converting up to
+    # `workers` images at a time
+    images = [image for image in images if _convertible(image)]
+    if not images:
+        raise ValueError("No valid image files selected")
+
+    for index, page_pdf in enumerate(_image_pages(images, workers)):
+        count("image_pdf_bytes", len(page_pdf))
+        src = fitz.open(stream=page_pdf, filetype="pdf")
+        try:
+            doc.insert_pdf(src)
+        finally:
+            src.close()
+        report(progress, index + 1, len(images))
+    return len(images)
+
+
+@traced("convert")
+def convert_to_pdf(images, output, streaming=False, workers=1, batch_size=STREAM_BATCH_SIZE, progress=None):
+    if streaming:
+        return stream_convert_to_pdf(images, output, workers=workers, batch_size=batch_size, progress=progress)
+
+    import img2pdf
+
+    image_list = []
+    with span("read images") as read:
+        for index, image in enumerate(images):
+            if is_path(image):
+                if _convertible(image):
+                    with open(image, 'rb') as img_file:
+                        image_list.append(img_file.read())
+            else:
+                image_list.append(image.read())
+            report(progress, index + 1, len(images))
+        read.set("images", len(image_list))
+        read.set("bytes", sum(len(data) for data in image_list))
+
+    if not image_list:
+        raise ValueError("No valid image files selected")
+
+    # img2pdf writes straight to the output instead of building the whole
+    # PDF as one more in-memory copy of every image
+    with span("convert", pages=len(image_list)):
+        if is_path(output):
+            with open(output, "wb") as pdf_file:
+                img2pdf.convert(image_list, outputstream=pdf_file)
+        else:
+            img2pdf.convert(image_list, outputstream=output)
+
+    return OperationResult(
+        "convert",
+        outputs=[output],
+        page_count=len(image_list),
+        message="Images converted to PDF successfully"
+    )
+
+
+def compress_document(doc, options, workers=1, progress=None):
+    # Recompresses images and subsets fonts of an open document in place.
+    # The space is only reclaimed once it is saved with COMPRESS_SAVE_OPTIONS.
+    replaced = examined = 0
+    if options.touches_images:
+        with span("recompress images") as images:
+            replaced, examined = pdf_compress.recompress_images(doc, options, workers, progress)
+            images.set("examined", examined)
+            images.set("replaced", replaced)
+    with span("subset fonts"):
+        fonts_subset = options.subset_fonts and pdf_compress.subset_fonts(doc)
+    return replaced, examined, fonts_subset
+
+
+@traced("compress")
+def compress_pdf(source, output, preset=None, dpi=None, jpeg_quality=None, color=None, subset_fonts=None,
+                 workers=1, progress=None):
+    options = pdf_compress.resolve_options(
+        preset, dpi=dpi, jpeg_quality=jpeg_quality, color=color, subset_fonts=subset_fonts
+    )
+    original_size = source_size(source)
+    with span("open", bytes=original_size):
+        doc = open_fitz(source)
+    try:
+        page_count = len(doc)
+        with span("measure objects"):
+            before = pdf_compress.object_sizes(doc)
+        replaced, examined, fonts_subset = compress_document(doc, options, workers, progress)
+        with span("write", pages=page_count):
+            doc.save(output, **COMPRESS_SAVE_OPTIONS)
+        report(progress, 1, 1)
+    finally:
+        doc.close()
+
+    compressed_size = source_size(output)
+    reduction = (original_size - compressed_size) / original_size * 100 if original_size else 0.0
+    stats = {
+        "original_size": original_size,
+        "compressed_size": compressed_size,
+        "reduction": reduction,
+        "preset": preset or "lossless",
+        "images_recompressed": replaced,
+        "images_examined": examined,
+        "fonts_subset": fonts_subset
+    }
+    if is_path(output):
+        with span("measure objects"):
+            compressed = fitz.open(output)
+            try:
+                stats["saved_by_class"] = pdf_compress.savings_report(before, pdf_compress.object_sizes(compressed))
+                # Should stay empty: anything here is bytes garbage=4 failed to merge
+                stats["duplicate_streams"] = pdf_compress.duplicate_streams(compressed)
+            finally:
+                compressed.close()
+
+    return OperationResult(
+        "compress",
+        outputs=[output],
+        page_count=page_count,
+        message=f"PDF compressed successfully ({reduction:.1f}% reduction)",
+        stats=stats
+    )
+
+
+def _extract_xrefs(doc, output_dir, items, progress=None):
+    # items are (xref, file stem) pairs; each image is decoded and written once
+    extracted = []
+    for index, (xref, stem) in enumerate(items):
+        base_image = doc.extract_image(xref)
+        if base_image:
+            image_path = os.path.join(output_dir, f"{stem}.{base_image['ext']}")
+            with open(image_path, "wb") as image_file:
+                image_file.write(base_image["image"])
+            count("bytes_written", len(base_image["image"]))
+            extracted.append((xref, image_path, base_image["width"], base_image["height"], len(base_image["image"])))
+        report(progress, index + 1, len(items))
+    return extracted
+
+
+def _extract_shard(source, output_dir, items):
+    # Worker-process entry point: each worker opens the document once
+    doc = fitz.open(source)
+    try:
+        return _extract_xrefs(doc, output_dir, items)
+    finally:
+        doc.close()
+
+
+def _link_duplicate(original, path):
+    # Hardlinks need a filesystem that supports them, so fall back to a copy
+    try:
+        os.link(original, path)
+    except OSError:
+        shutil.copyfile(original, path)
+
+
+@traced("extract")
+def extract_images(source, output_dir, duplicates="hardlink", workers=1, manifest=True, progress=None):
+    if duplicates not in DUPLICATE_MODES:
+        raise ValueError(f"Unknown duplicate mode: {duplicates}")
+
+    # Index every image occurrence by xref, so an image shared by many pages
+    # is extracted once under the name of its first occurrence
+    doc = open_fitz(source)
+    try:
+        page_count = len(doc)
+        occurrences = []
+        first_seen = {}
+        with span("index images", pages=page_count):
+            for page_num in range(page_count):
+                for img_index, img in enumerate(doc[page_num].get_images()):
+                    xref = img[0]
+                    stem = f"image_{page_num + 1}_{img_index + 1}"
+                    occurrences.append((page_num, img_index, xref, stem))
+                    first_seen.setdefault(xref, stem)
+
+        items = list(first_seen.items())
+        with span("extract", images=len(items), workers=workers):
+            if workers > 1 and len(items) > 1 and is_path(source):
+                tasks = [((os.fspath(source), output_dir, shard), len(shard)) for shard in shard_items(items, workers)]
+                extracted = [image for shard in run_shards(_extract_shard, tasks, workers, progress) for image in shard]
+            else:
+                extracted = _extract_xrefs(doc, output_dir, items, progress)
+    finally:
+        doc.close()
+
+    images = {xref: {"file": path, "width": width, "height": height, "bytes": size}
+              for xref, path, width, height, size in extracted}
+    outputs = [image["file"] for image in images.values()]
+    pages = [{"page": page_num + 1, "images": []} for page_num in range(page_count)]
+    for page_num, img_index, xref, stem in occurrences:
+        image = images.get(xref)
+        if image is None:
+            continue
+        entry = {"index": img_index + 1, "xref": xref, "file": os.path.basename(image["file"])}
+        if first_seen[xref] != stem:
+            entry["duplicate_of"] = entry["file"]
+            if duplicates != "manifest":
+                path = os.path.join(output_dir, stem + os.path.splitext(image["file"])[1])
+                if duplicates == "hardlink":
+                    _link_duplicate(image["file"], path)
+                else:
+                    shutil.copyfile(image["file"], path)
+                entry["file"] = os.path.basename(path)
+                outputs.append(path)
+        pages[page_num]["images"].append(entry)
+
+    image_count = sum(len(page["images"]) for page in pages)
+    stats = {"unique_images": len(images), "occurrences": image_count, "duplicates": duplicates}
+    if manifest:
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        with open(manifest_path, "w") as manifest_file:
+            json.dump({
+                "source": source_stem(source),
+                "pages": pages,
+                "images": {str(xref): {**image, "file": os.path.basename(image["file"])} for xref, image in images.items()}
+            }, manifest_file, indent=2)
+        stats["manifest"] = manifest_path
+
+    return OperationResult(
+        "extract",
+        outputs=outputs,
+        page_count=page_count,
+        message=f"Extracted {image_count} images from PDF ({len(images)} unique)",
+        stats=stats
+    )
+
+
+def page_texts(doc, start=0, stop=None):
+    # Plain text of pages [start, stop), in reading order within each block
+    stop = len(doc) if stop is None else stop
+    return [doc[page_num].get_text("text") for page_num in range(start, stop)]
+
+
+def _text_shard(source, start, stop):
+    # Worker-process entry point: each worker opens the document once
+    doc = fitz.open(source)
+    try:
+        return page_texts(doc, start, stop)
+    finally:
+        doc.close()
+
+
+@traced("text")
+def extract_text(source, output, workers=1, progress=None):
+    # Writes the text of every page to output, pages separated by form
+    # feeds as pdftotext does. Workers each extract a range of pages.
+    with span("open"):
+        doc = open_fitz(source)
+    try:
+        page_count = len(doc)
+        with span("extract text", pages=page_count, workers=workers):
+            if workers > 1 and page_count > 1 and is_path(source):
+                shards = shard_items(list(range(page_count)), workers)
+                tasks = [((os.fspath(source), shard[0], shard[-1] + 1), len(shard)) for shard in shards]
+                texts = [text for shard in run_shards(_text_shard, tasks, workers, progress) for text in shard]
+            else:
+                texts = []
+                for page_num in range(page_count):
+                    texts.extend(page_texts(doc, page_num, page_num + 1))
+                    report(progress, page_num + 1, page_count)
+    finally:
+        doc.close()
+
+    with span("write"):
+        if is_path(output):
+            with open(output, "w", encoding="utf-8") as text_file:
+                text_file.write("\f".join(texts))
+        else:
+            output.write("\f".join(texts).encode("utf-8"))
+
+    characters = sum(len(text) for text in texts)
+    return OperationResult(
+        "text",
+        outputs=[output],
+        page_count=page_count,
+        message=f"Extracted text from {page_count} pages ({characters} characters)",
+        stats={"characters": characters, "empty_pages": sum(not text.strip() for text in texts), "workers": workers}
+    )
+
+
+@traced("render")
+def render_pages(source, output_dir, fmt="png", dpi=pdf_render.DEFAULT_DPI, color="rgb", pages=None, alpha=False,
+                 jpeg_quality=pdf_render.JPEG_QUALITY, multipage=False, workers=1, progress=None):
+    # Renders pages to one image file each in output_dir or, with multipage,
+    # to a single TIFF written one page at a time. Each worker opens the
+    # document once, and at most a window of encoded pages is in memory.
+    pdf_render.check_options(fmt, color, alpha)
+    if multipage and fmt != "tiff":
+        raise ValueError("Only TIFF output can hold several pages")
+    dpi = int(dpi)
+    if dpi < 1:
+        raise ValueError("DPI must be at least 1")
+
+    stem = source_stem(source)
+    extension = pdf_render.FORMAT_EXTENSIONS[fmt]
+    doc = open_fitz(source)
+    try:
+        page_count = len(doc)
+        selected = select_pages(pages, page_count)
+        if multipage:
+            outputs = [os.path.join(output_dir, stem + extension)]
+            tasks = [(page_num, None) for page_num in selected]
+        else:
+            tasks = [(page_num, os.path.join(output_dir, f"{stem}_page_{page_num + 1}{extension}"))
+                     for page_num in selected]
+            outputs = [path for _, path in tasks]
+
+        options = (fmt, color, dpi, alpha, jpeg_quality)
+        if workers > 1 and len(tasks) > 1 and is_path(source):
+            results = ordered_map(partial(pdf_render.render_task, fmt=fmt, color=color, dpi=dpi, alpha=alpha,
+                                          jpeg_quality=jpeg_quality),
+                                  tasks, min(workers, len(tasks)),
+                                  initializer=pdf_render.open_worker, initargs=(os.fspath(source),))
+        else:
+            results = (pdf_render.render_task(task, *options, doc=doc) for task in tasks)
+
+        written = 0
+        with span("render", pages=len(tasks), dpi=dpi, workers=workers) as rendered:
+            if multipage:
+                def encoded_pages():
+                    for index, (_, data) in enumerate(results):
+                        nonlocal written
+                        written += len(data)
+                        yield data
+                        report(progress, index + 1, len(tasks))
+                pdf_render.write_multipage_tiff(outputs[0], encoded_pages())
+            else:
+                for index, (_, size) in enumerate(results):
+                    written += size
+                    report(progress, index + 1, len(tasks))
+            rendered.set("bytes", written)
+    finally:
+        doc.close()
+
+    return OperationResult(
+        "render",
+        outputs=outputs,
+        page_count=len(tasks),
+        message=f"Rendered {len(tasks)} page(s) at {dpi} dpi",
+        stats={"format": fmt, "dpi": dpi, "color": color, "multipage": multipage, "bytes": written,
+               "workers": workers, "peak_rss": peak_rss()}
+    )
+
+
+def select_pages(spec, num_pages):
+    # None or "all", "odd", "even", or a range list such as "1-3,7"
+    if spec in (None, "", "all"):
+        return list(range(num_pages))
+    if spec == "odd":
+        return list(range(0, num_pages, 2))
+    if spec == "even":
+        return list(range(1, num_pages, 2))
+    return sorted({page_num for start, stop in parse_page_ranges(spec, num_pages) for page_num in range(start, stop)})
+
+
+def detect_text_rotation(page):
+    # Rotation that makes the page's dominant text direction horizontal, or
+    # None for pages without text. Line directions are in unrotated page
+    # space with y pointing down, so text running bottom-to-top is (0, -1).
+    weights = {}
+    for block in page.get_text("dict")["blocks"]:
+        for line in block.get("lines", []):
+            cos, sin = line["dir"]
+            angle = round(math.degrees(math.atan2(-sin, cos)) / 90) * 90 % 360
+            length = sum(len(span["text"].strip()) for span in line["spans"])
+            weights[angle] = weights.get(angle, 0) + length
+    if not weights or not max(weights.values()):
+        return None
+    return max(weights, key=weights.get)
+
+
+def same_file(source, output):
+    return is_path(source) and is_path(output) and os.path.exists(output) and os.path.samefile(source, output)
+
+
+def rotate_document(doc, rotation=90, pages=None, relative=False, auto=False, progress=None):
+    # Rotates pages of an open document and returns how many changed
+    if not auto:
+        rotation = int(rotation)
+        if rotation not in ROTATION_ANGLES:
+            raise ValueError("Invalid rotation angle")
+
+    selected = select_pages(pages, len(doc))
+    changed = 0
+    with span("rotate", pages=len(selected), auto=auto) as rotating:
+        for index, page_num in enumerate(selected):
+            page = doc[page_num]
+            if auto:
+                target = detect_text_rotation(page)
+            elif relative:
+                target = (page.rotation + rotation) % 360
+            else:
+                target = rotation
+            if target is not None and target != page.rotation:
+                page.set_rotation(target)
+                changed += 1
+            report(progress, index + 1, len(selected))
+        rotating.set("changed", changed)
+    return changed
+
+
+@traced("rotate")
+def rotate_pages(source, output, rotation=90, pages=None, relative=False, auto=False, progress=None):
+    if not auto:
+        rotation = int(rotation)
+        if rotation not in ROTATION_ANGLES:
+            raise ValueError("Invalid rotation angle")
+
+    in_place = same_file(source, output)
+    doc = open_fitz(source)
+    try:
+        page_count = len(doc)
+        changed = rotate_document(doc, rotation, pages, relative, auto, progress)
+
+        # Rotating in place only appends the changed page objects to the
+        # file, so a few pages of a huge PDF cost kilobytes, not a rewrite
+        incremental = in_place and doc.can_save_incrementally()
+        with span("write", incremental=incremental):
+            if incremental:
+                doc.saveIncr()
+            elif in_place:
+                # A file can't be rewritten while it is open, so go through a .part file
+                doc.save(os.fspath(output) + ".part")
+            else:
+                doc.save(output)
+    finally:
+        doc.close()
+    if in_place and not incremental:
+        os.replace(os.fspath(output) + ".part", output)
+
+    return OperationResult(
+        "rotate",
+        outputs=[output],
+        page_count=page_count,
+        message=f"PDF rotated successfully ({changed} page(s) changed)",
+        stats={
+            "rotation": "auto" if auto else rotation,
+            "relative": relative,
+            "pages_changed": changed,
+            "incremental": incremental
+        }
+    )
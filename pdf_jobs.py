@@ -0,0 +1,89 @@
+import itertools
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from pdf_parallel import OperationCancelled
+
+# kind is one of "progress", "done", "error" or "cancelled"
+JobEvent = namedtuple("JobEvent", ["kind", "job", "payload"])
+
+
+class Job:
+    def __init__(self, job_id, name):
+        self.id = job_id
+        self.name = name
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise OperationCancelled(f"{self.name} cancelled")
+
+
+class JobExecutor:
+    # Runs engine operations on worker threads and reports back through a queue,
+    # so the caller (the Tk main loop) only ever has to poll.
+    def __init__(self, max_workers=1):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pdf-job")
+        self._ids = itertools.count(1)
+        self._active = set()
+        self._lock = threading.Lock()
+        self.events = queue.Queue()
+
+    def submit(self, name, func, *args, **kwargs):
+        job = Job(next(self._ids), name)
+
+        def progress(done, total):
+            job.check_cancelled()
+            self.events.put(JobEvent("progress", job, (done, total)))
+
+        def run():
+            try:
+                job.check_cancelled()
+                result = func(*args, progress=progress, **kwargs)
+            except OperationCancelled:
+                self.events.put(JobEvent("cancelled", job, None))
+            except Exception as e:
+                self.events.put(JobEvent("error", job, e))
+            else:
+                self.events.put(JobEvent("done", job, result))
+            finally:
+                with self._lock:
+                    self._active.discard(job)
+
+        with self._lock:
+            self._active.add(job)
+        job.future = self._pool.submit(run)
+        return job
+
+    def poll(self):
+        # Drain every pending event without blocking
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    @property
+    def busy(self):
+        with self._lock:
+            return bool(self._active)
+
+    def cancel_all(self):
+        with self._lock:
+            for job in self._active:
+                job.cancel()
+
+    def shutdown(self, wait=False):
+        self.cancel_all()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
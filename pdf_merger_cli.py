@@ -0,0 +1,455 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+
+import pdf_batch
+import pdf_engine
+import pdf_pipeline
+import pdf_render
+import pdf_watch
+from pdf_batch import BATCH_TOOLS, PDF_EXTENSIONS, collect_inputs, input_extensions
+from pdf_backends import BACKENDS
+from pdf_cache import ResultCache
+from pdf_compress import COLOR_MODES, PRESETS
+from pdf_metrics import format_size
+from pdf_search import SearchIndex
+from pdf_trace import PROFILE_MODES, TRACE_FORMATS, profile_call, tracer
+
+BACKEND_CHOICES = ["auto"] + list(BACKENDS)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m pdf_merger_cli",
+        description="Run PDF Merger tools without the GUI"
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--cache-dir", help="Result cache location (default: $PDF_MERGER_CACHE_DIR or the user cache)")
+    parser.add_argument("--no-cache", action="store_true", help="Always reprocess, even for identical inputs")
+    parser.add_argument("--trace", metavar="FILE", help="Append timing spans for each phase to FILE")
+    parser.add_argument("--trace-format", choices=TRACE_FORMATS, default="jsonl",
+                        help="Span format: plain JSON lines or OpenTelemetry OTLP/JSON")
+    parser.add_argument("--profile", choices=PROFILE_MODES, help="Profile this run with cProfile or tracemalloc")
+    parser.add_argument("--profile-output", metavar="FILE",
+                        help="Write the profile to FILE instead of stderr (.prof keeps raw cProfile stats)")
+    tools = parser.add_subparsers(dest="tool", required=True)
+
+    merge = tools.add_parser("merge", help="Merge PDFs into one file")
+    merge.add_argument("output")
+    merge.add_argument("inputs", nargs="+", help="PDF files, optionally with pages as file.pdf@1-3,7")
+    merge.add_argument("--streaming", action="store_true", help="Write the output incrementally with bounded memory")
+    merge.add_argument("--batch-size", type=int, default=pdf_engine.STREAM_BATCH_SIZE,
+                       help="Inputs merged between incremental writes in streaming mode")
+    merge.add_argument("--backend", choices=BACKEND_CHOICES, help="PDF library to merge with")
+    merge.add_argument("--dedupe", action="store_true",
+                       help="Store fonts, images and color profiles shared by several inputs once")
+
+    split = tools.add_parser("split", help="Split a PDF into single pages, chunks or ranges")
+    split.add_argument("input")
+    split.add_argument("output_dir")
+    split.add_argument("--workers", type=int, default=1, help="Worker processes to split with")
+    split.add_argument("--backend", choices=BACKEND_CHOICES, help="PDF library to split with")
+    split_mode = split.add_mutually_exclusive_group()
+    split_mode.add_argument("--every", type=int, metavar="N", help="Write one file per N pages")
+    split_mode.add_argument("--ranges", metavar="SPEC", help='Write one file per range, e.g. "1-10,11-40,41-"')
+    split_mode.add_argument("--bookmarks", type=int, metavar="LEVEL", help="Split at bookmarks up to this outline level")
+    split_mode.add_argument("--max-size", type=float, metavar="MB", help="Split into files of about this size")
+
+    convert = tools.add_parser("convert", help="Convert images to a PDF")
+    convert.add_argument("output")
+    convert.add_argument("inputs", nargs="+")
+    convert.add_argument("--streaming", action="store_true", help="Write pages as they are converted with bounded memory")
+    convert.add_argument("--workers", type=int, default=1, help="Worker processes to prepare images with")
+    convert.add_argument("--batch-size", type=int, default=pdf_engine.STREAM_BATCH_SIZE,
+                         help="Pages written between incremental writes in streaming mode")
+
+    compress = tools.add_parser("compress", help="Compress a PDF")
+    compress.add_argument("input")
+    compress.add_argument("output")
+    compress.add_argument("--preset", choices=list(PRESETS), help="Compression preset")
+    compress.add_argument("--dpi", type=int, help="Downsample images above this resolution")
+    compress.add_argument("--quality", type=int, help="JPEG quality for recompressed images (1-95)")
+    compress.add_argument("--color", choices=COLOR_MODES, help="Convert images to grayscale or black and white")
+    compress.add_argument("--subset-fonts", action="store_true", default=None, help="Subset embedded fonts")
+    compress.add_argument("--workers", type=int, default=1, help="Worker processes to recompress images with")
+
+    extract = tools.add_parser("extract", help="Extract embedded images from a PDF")
+    extract.add_argument("input")
+    extract.add_argument("output_dir")
+    extract.add_argument("--workers", type=int, default=1, help="Worker processes to extract with")
+    extract.add_argument("--duplicates", choices=pdf_engine.DUPLICATE_MODES, default="hardlink",
+                         help="How to store images repeated on several pages")
+    extract.add_argument("--no-manifest", action="store_true", help="Skip writing manifest.json")
+
+    rotate = tools.add_parser("rotate", help="Rotate all or selected pages of a PDF")
+    rotate.add_argument("input")
+    rotate.add_argument("output")
+    rotate.add_argument("--angle", type=int, choices=pdf_engine.ROTATION_ANGLES, default=90)
+    rotate.add_argument("--pages", help='Pages to rotate: "odd", "even" or ranges such as "1-3,7"')
+    rotate.add_argument("--relative", action="store_true", help="Add to each page's current rotation")
+    rotate.add_argument("--auto", action="store_true", help="Rotate pages to match their detected text direction")
+
+    render = tools.add_parser("render", help="Render pages to PNG, JPEG or TIFF images")
+    render.add_argument("input")
+    render.add_argument("output_dir")
+    render.add_argument("--format", choices=pdf_render.RENDER_FORMATS, default="png")
+    render.add_argument("--dpi", type=int, default=pdf_render.DEFAULT_DPI)
+    render.add_argument("--color", choices=pdf_render.RENDER_COLORS, default="rgb",
+                        help="bilevel writes 1-bit images (Group 4 compressed in TIFF)")
+    render.add_argument("--pages", help='Pages to render: "odd", "even" or ranges such as "1-3,7"')
+    render.add_argument("--alpha", action="store_true", help="Keep a transparent background (PNG or TIFF, rgb)")
+    render.add_argument("--quality", type=int, default=pdf_render.JPEG_QUALITY, help="JPEG quality")
+    render.add_argument("--multipage", action="store_true", help="Write all pages to one TIFF file")
+    render.add_argument("--workers", type=int, default=1, help="Worker processes to render with")
+
+    text = tools.add_parser("text", help="Extract the text of every page to a UTF-8 file")
+    text.add_argument("input")
+    text.add_argument("output")
+    text.add_argument("--workers", type=int, default=1, help="Worker processes to extract with")
+
+    index = tools.add_parser("index", help="Add PDFs to the full-text search index, skipping unchanged files")
+    index.add_argument("inputs", nargs="+", help="Files, directories or glob patterns")
+    index.add_argument("--index", help="Index file (default: $PDF_MERGER_INDEX or the user cache)")
+    index.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Files read in parallel")
+    index.add_argument("--prune", action="store_true", help="Drop indexed files that no longer exist")
+    index.add_argument("--no-recursive", action="store_true", help="Don't descend into subdirectories")
+
+    search = tools.add_parser("search", help="Find the files and pages containing some text")
+    search.add_argument("query")
+    search.add_argument("--index", help="Index file (default: $PDF_MERGER_INDEX or the user cache)")
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--raw", action="store_true", help="Read the query as FTS5 syntax (AND, OR, NEAR, prefix*)")
+
+    batch = tools.add_parser("batch", help="Run one tool over many files, directories or glob patterns")
+    batch.add_argument("batch_tool", choices=BATCH_TOOLS)
+    batch.add_argument("output_dir")
+    batch.add_argument("inputs", nargs="+", help="Files, directories or glob patterns")
+    batch.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Files processed in parallel")
+    batch.add_argument("--checkpoint", help="JSON lines file of finished files, used to resume a batch")
+    batch.add_argument("--no-recursive", action="store_true", help="Don't descend into subdirectories")
+    batch.add_argument("--angle", type=int, choices=pdf_engine.ROTATION_ANGLES, default=90, help="rotate: angle")
+    batch.add_argument("--preset", choices=list(PRESETS), help="compress: compression preset")
+    batch.add_argument("--format", choices=pdf_render.RENDER_FORMATS, default="png", help="render: image format")
+    batch.add_argument("--dpi", type=int, default=pdf_render.DEFAULT_DPI, help="render: resolution")
+    batch_split = batch.add_mutually_exclusive_group()
+    batch_split.add_argument("--every", type=int, metavar="N", help="split: one file per N pages")
+    batch_split.add_argument("--ranges", metavar="SPEC", help="split: one file per page range")
+
+    pipeline = tools.add_parser("pipeline", help="Run several tools on one document, writing it once at the end")
+    pipeline.add_argument("spec", help="JSON (or YAML) file with steps and optionally inputs and output")
+    pipeline.add_argument("inputs", nargs="*", help="Inputs, replacing those in the file (file.pdf@1-3 for pages)")
+    pipeline.add_argument("--output", help="Output PDF, replacing the one in the file")
+    pipeline.add_argument("--workers", type=int, default=1, help="Worker processes to convert and recompress with")
+
+    watch = tools.add_parser("watch", help="Watch folders and run a pipeline on files as they arrive")
+    watch.add_argument("output_dir")
+    watch.add_argument("inputs", nargs="+", help="Directories to watch")
+    watch.add_argument("--pipeline", default=",".join(pdf_watch.DEFAULT_PIPELINE),
+                       help=f"Comma-separated steps from {', '.join(pdf_watch.WATCH_STEPS)}, "
+                            f"e.g. convert,merge,compress")
+    watch.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Files processed in parallel")
+    watch.add_argument("--max-pending", type=int, default=0,
+                       help="Jobs in flight before new files wait (default: twice the workers)")
+    watch.add_argument("--batch-size", type=int, default=pdf_watch.BATCH_SIZE, help="Files merged into one output")
+    watch.add_argument("--batch-window", type=float, default=pdf_watch.BATCH_WINDOW, metavar="SECONDS",
+                       help="Merge a smaller batch once its first file has waited this long")
+    watch.add_argument("--settle", type=float, default=pdf_watch.SETTLE_SECONDS, metavar="SECONDS",
+                       help="Wait until a file has stopped changing for this long")
+    watch.add_argument("--poll", action="store_true", help="Poll instead of using inotify, e.g. on network shares")
+    watch.add_argument("--poll-interval", type=float, default=pdf_watch.POLL_INTERVAL, metavar="SECONDS")
+    watch.add_argument("--stats-interval", type=float, default=pdf_watch.STATS_INTERVAL, metavar="SECONDS",
+                       help="Print throughput and latency this often (0 to only print at exit)")
+    watch.add_argument("--no-recursive", action="store_true", help="Don't watch subdirectories")
+    watch.add_argument("--checkpoint", help="JSON lines file of finished files, skipped after a restart")
+    watch.add_argument("--archive", metavar="DIR", help="Move inputs here once their output is written")
+    watch.add_argument("--once", action="store_true", help="Process the files already there, then exit")
+    watch.add_argument("--preset", choices=list(PRESETS), help="compress: compression preset")
+    watch.add_argument("--angle", type=int, choices=pdf_engine.ROTATION_ANGLES, default=90, help="rotate: angle")
+    watch.add_argument("--dedupe", action="store_true", help="merge: store shared fonts and images once")
+
+    return parser
+
+
+def batch_options(args):
+    if args.batch_tool == "rotate":
+        return {"rotation": args.angle}
+    if args.batch_tool == "compress":
+        return {"preset": args.preset}
+    if args.batch_tool == "render":
+        return {"fmt": args.format, "dpi": args.dpi}
+    if args.batch_tool == "split" and args.every is not None:
+        return {"mode": "every", "value": args.every}
+    if args.batch_tool == "split" and args.ranges is not None:
+        return {"mode": "ranges", "value": args.ranges}
+    return {}
+
+
+def run_batch(args):
+    inputs = collect_inputs(args.inputs, input_extensions(args.batch_tool), recursive=not args.no_recursive)
+    result = pdf_batch.run_batch(
+        args.batch_tool,
+        inputs,
+        args.output_dir,
+        options=batch_options(args),
+        workers=args.workers,
+        checkpoint=args.checkpoint
+    )
+
+    if args.json:
+        print(json.dumps({"summary": result.summary(), "records": result.records}))
+    else:
+        for record in result.failed:
+            print(f"FAILED {record['input']}: {record['error']}", file=sys.stderr)
+        summary = result.summary()
+        print(result.message)
+        print(f"Elapsed: {summary['elapsed_seconds']:.1f}s, "
+              f"{summary['pages_per_sec']:.0f} pages/sec, {summary['mb_per_sec']:.1f} MB/sec")
+    return 1 if result.failed else 0
+
+
+def print_watch_record(record, as_json=False):
+    if as_json:
+        print(json.dumps({"record": record}), flush=True)
+    elif record["status"] == "ok":
+        print(f"OK {record['output']} ({len(record['inputs'])} file(s), {record['pages']} pages, "
+              f"{record['seconds']:.1f}s)", flush=True)
+    else:
+        print(f"FAILED {', '.join(record['inputs'])}: {record['error']}", file=sys.stderr, flush=True)
+
+
+def print_watch_stats(stats, as_json=False):
+    if as_json:
+        print(json.dumps({"stats": stats}), flush=True)
+        return
+    latency = ("n/a" if stats["latency_p50"] is None else
+               f"p50 {stats['latency_p50']:.1f}s, p95 {stats['latency_p95']:.1f}s, max {stats['latency_max']:.1f}s")
+    print(f"[{stats['uptime_seconds']:.0f}s] {stats['files_done']} done, {stats['files_failed']} failed, "
+          f"{stats['waiting']} settling, {stats['queued']} batched, {stats['running']} running | "
+          f"{stats['files_per_sec']:.2f} files/sec, {stats['mb_per_sec']:.1f} MB/sec | latency {latency}",
+          flush=True)
+
+
+def run_watch(args):
+    config = pdf_watch.WatchConfig(
+        inputs=args.inputs,
+        output_dir=args.output_dir,
+        steps=pdf_watch.parse_pipeline(args.pipeline),
+        options={"preset": args.preset, "rotation": args.angle, "dedupe": args.dedupe},
+        workers=args.workers,
+        batch_size=args.batch_size,
+        batch_window=args.batch_window,
+        settle=args.settle,
+        max_pending=args.max_pending,
+        stats_interval=args.stats_interval,
+        poll=args.poll,
+        poll_interval=args.poll_interval,
+        recursive=not args.no_recursive,
+        checkpoint=args.checkpoint,
+        archive_dir=args.archive,
+        once=args.once
+    )
+    service = pdf_watch.WatchService(
+        config,
+        on_record=lambda record: print_watch_record(record, args.json),
+        on_stats=lambda stats: print_watch_stats(stats, args.json)
+    )
+
+    def interrupt(signum, frame):
+        # The first signal finishes running jobs; a second one gives up
+        if service.stopping:
+            raise KeyboardInterrupt
+        print("Stopping after running jobs finish...", file=sys.stderr, flush=True)
+        service.stop()
+
+    signal.signal(signal.SIGINT, interrupt)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, interrupt)
+    if not args.json:
+        print(f"Watching {', '.join(args.inputs)}: {' -> '.join(service.steps)}", flush=True)
+    stats = service.run()
+    return 1 if stats.files_failed else 0
+
+
+def run_search(args):
+    with SearchIndex(args.index) as index:
+        start = time.perf_counter()
+        hits = index.search(args.query, limit=args.limit, raw=args.raw)
+        elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps({"hits": hits, "seconds": elapsed}))
+    else:
+        for hit in hits:
+            print(f"{hit['path']}:{hit['page']}: {' '.join(hit['snippet'].split())}")
+        print(f"{len(hits)} hit(s) in {elapsed * 1000:.1f} ms", file=sys.stderr)
+    return 0 if hits else 1
+
+
+def split_mode(args):
+    if args.every is not None:
+        return "every", args.every
+    if args.ranges is not None:
+        return "ranges", args.ranges
+    if args.bookmarks is not None:
+        return "bookmarks", args.bookmarks
+    if args.max_size is not None:
+        return "size", args.max_size
+    return "page", None
+
+
+def run_cached(cache, operation, func, source, output, params, **options):
+    # In-place saves write only the changes, and streaming runs are too big
+    # to keep; the cache would hash and copy the whole file for nothing
+    if cache is None or options.get("streaming") or pdf_engine.same_file(source, output):
+        return func(source, output, **params, **options)
+    return cache.run(operation, func, source, output, params, **options)
+
+
+def run_tool(args):
+    cache = None if args.no_cache else ResultCache(args.cache_dir)
+    if args.tool == "merge":
+        inputs, page_ranges = zip(*[pdf_engine.merge_part(arg) for arg in args.inputs])
+        return run_cached(
+            cache,
+            "merge",
+            pdf_engine.merge_pdfs,
+            list(inputs),
+            args.output,
+            {"page_ranges": list(page_ranges), "backend": args.backend, "dedupe": args.dedupe},
+            streaming=args.streaming,
+            batch_size=args.batch_size
+        )
+    if args.tool == "split":
+        os.makedirs(args.output_dir, exist_ok=True)
+        mode, value = split_mode(args)
+        return pdf_engine.split_pdf(
+            args.input,
+            args.output_dir,
+            mode=mode,
+            value=value,
+            workers=args.workers,
+            backend=args.backend
+        )
+    if args.tool == "convert":
+        return run_cached(
+            cache,
+            "convert",
+            pdf_engine.convert_to_pdf,
+            args.inputs,
+            args.output,
+            {},
+            streaming=args.streaming,
+            workers=args.workers,
+            batch_size=args.batch_size
+        )
+    if args.tool == "compress":
+        params = {
+            "preset": args.preset,
+            "dpi": args.dpi,
+            "jpeg_quality": args.quality,
+            "color": args.color,
+            "subset_fonts": args.subset_fonts
+        }
+        return run_cached(cache, "compress", pdf_engine.compress_pdf, args.input, args.output, params,
+                          workers=args.workers)
+    if args.tool == "extract":
+        os.makedirs(args.output_dir, exist_ok=True)
+        return pdf_engine.extract_images(
+            args.input,
+            args.output_dir,
+            duplicates=args.duplicates,
+            workers=args.workers,
+            manifest=not args.no_manifest
+        )
+    if args.tool == "render":
+        os.makedirs(args.output_dir, exist_ok=True)
+        return pdf_engine.render_pages(
+            args.input,
+            args.output_dir,
+            fmt=args.format,
+            dpi=args.dpi,
+            color=args.color,
+            pages=args.pages,
+            alpha=args.alpha,
+            jpeg_quality=args.quality,
+            multipage=args.multipage,
+            workers=args.workers
+        )
+    if args.tool == "text":
+        return pdf_engine.extract_text(args.input, args.output, workers=args.workers)
+    if args.tool == "index":
+        inputs = collect_inputs(args.inputs, PDF_EXTENSIONS, recursive=not args.no_recursive)
+        with SearchIndex(args.index) as index:
+            return index.update(inputs, workers=args.workers, prune=args.prune)
+    if args.tool == "pipeline":
+        spec = pdf_pipeline.load_pipeline(args.spec)
+        output = args.output or spec.get("output")
+        if not output:
+            raise ValueError("No output given, in the pipeline file or with --output")
+        return pdf_pipeline.run_pipeline(spec["steps"], output, args.inputs or spec.get("inputs"),
+                                         workers=args.workers)
+    if args.tool == "rotate":
+        # Passing the input path as output rotates in place with an incremental save
+        params = {"rotation": args.angle, "pages": args.pages, "relative": args.relative, "auto": args.auto}
+        return run_cached(cache, "rotate", pdf_engine.rotate_pages, args.input, args.output, params)
+    raise ValueError(f"Unknown tool: {args.tool}")
+
+
+def print_result(result, as_json=False):
+    if as_json:
+        print(json.dumps({
+            "operation": result.operation,
+            "outputs": [str(output) for output in result.outputs],
+            "page_count": result.page_count,
+            "message": result.message,
+            "stats": result.stats
+        }))
+    else:
+        print(result.message)
+        if "cache" in result.stats:
+            print(f"Cache: {result.stats['cache']}")
+        if result.stats.get("peak_rss") is not None:
+            print(f"Peak RSS: {format_size(result.stats['peak_rss'])}")
+        for kind, sizes in result.stats.get("saved_by_class", {}).items():
+            print(f"  {kind:<14} {format_size(sizes['before']):>10} -> {format_size(sizes['after']):>10}")
+        for kind, entry in result.stats.get("duplicate_streams", {}).items():
+            print(f"Left duplicated: {entry['duplicates']} {kind} stream(s), {format_size(entry['bytes'])}",
+                  file=sys.stderr)
+        for stage in result.stats.get("stages", []):
+            print(f"  {stage['op']:<10} {stage['seconds']:>8.2f}s {stage['pages']:>6} pages")
+        for path, error in result.stats.get("errors", {}).items():
+            print(f"FAILED {path}: {error}", file=sys.stderr)
+        dedupe = result.stats.get("dedupe")
+        if dedupe:
+            print(f"Deduplication: {format_size(dedupe['size_before'])} -> {format_size(dedupe['size_after'])} "
+                  f"in {dedupe['seconds']:.2f}s (hashing {dedupe['hash_seconds']:.2f}s)")
+            for kind, entry in dedupe["duplicates_by_class"].items():
+                print(f"  {kind:<14} {entry['duplicates']:>6} duplicate(s) {format_size(entry['bytes']):>10}")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if args.trace:
+            tracer.configure(args.trace, args.trace_format)
+        if args.tool == "batch":
+            return run_batch(args)
+        if args.tool == "watch":
+            return run_watch(args)
+        if args.tool == "search":
+            return run_search(args)
+        if args.profile:
+            result = profile_call(args.profile, run_tool, args, output=args.profile_output)
+        else:
+            result = run_tool(args)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print_result(result, args.json)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,40 @@
+import base64
+import math
 import os
 import sys
 import json
-import requests
+import multiprocessing
 from tkinter import *
 from tkinter import ttk, filedialog, messagebox, simpledialog
-from PyPDF2 import PdfReader, PdfWriter, PdfMerger
-import img2pdf
-from PIL import Image
-import fitz  # PyMuPDF
 import tempfile
-from pathlib import Path
+# The engine modules and the PDF and imaging libraries behind them are
+# imported by the tool methods on first use, which keeps startup fast
+from pdf_cache import ResultCache, user_cache_dir
+from pdf_jobs import JobExecutor
+from pdf_metrics import format_size
+from pdf_registry import FileRegistry
+from pdf_thumbnails import THUMBNAIL_SIZE, ThumbnailCache, ThumbnailRenderer
+import pdf_updates
 
 CURRENT_VERSION = "1.0.0"
-UPDATE_URL = "https://api.github.com/repos/YOUR_USERNAME/PDF_Merger/releases/latest"  # Replace with your repository
+# PDF_MERGER_UPDATE_URL points the updater at another server, such as a local stand-in for testing
+UPDATE_URL = (os.environ.get("PDF_MERGER_UPDATE_URL")
+              or "https://api.github.com/repos/YOUR_USERNAME/PDF_Merger/releases/latest")  # Replace with your repository
+JOB_POLL_INTERVAL_MS = 100
+WORKER_PROCESSES = os.cpu_count() or 1
+PREVIEW_PADDING = 10
+PREVIEW_SLOT = THUMBNAIL_SIZE + PREVIEW_PADDING
+# Off-screen pages kept around the visible ones in the preview pane
+PREVIEW_SLACK = 2
+# Merges and conversions larger than this switch to the bounded-memory streaming mode
+STREAMING_THRESHOLD = 512 * 1024 * 1024
+SPLIT_MODES = {
+    "Every page": "page",
+    "Every N pages": "every",
+    "Page ranges": "ranges",
+    "By bookmark level": "bookmarks",
+    "By size (MB)": "size"
+}
 
 class PDFMergerApp:
     def __init__(self, root):
@@ -22,11 +44,24 @@ class PDFMergerApp:
         self.root.configure(bg="#ffffff")
         
         # Initialize variables
-        self.selected_files = []
+        self.files = FileRegistry()
+        self.cache = ResultCache()
+        self.updates = pdf_updates.UpdateChecker(UPDATE_URL, os.path.join(user_cache_dir(), "update.json"))
         self.current_feature = None
         self.temp_dir = tempfile.mkdtemp()
+        self.jobs = JobExecutor()
+        self.current_job = None
+        self.job_success_handler = None
+        self.thumbnails = ThumbnailRenderer(ThumbnailCache(os.path.join(self.temp_dir, "thumbnails")))
+        self.preview_path = None
+        self.preview_page_count = 0
+        self.preview_images = {}
         self.setup_styles()
         self.create_interface()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(JOB_POLL_INTERVAL_MS, self.poll_jobs)
+        self.root.after(JOB_POLL_INTERVAL_MS, self.poll_thumbnails)
+        self.root.after(JOB_POLL_INTERVAL_MS, self.poll_file_probes)
         self.check_for_updates()
         
     def setup_styles(self):
@@ -98,7 +133,8 @@ class PDFMergerApp:
             "Convert to PDF": self.select_convert,
             "Compress PDF": self.select_compress,
             "Extract Images": self.select_extract,
-            "Rotate Pages": self.select_rotate
+            "Rotate Pages": self.select_rotate,
+            "Render Pages": self.select_render
         }
         
         self.tool_buttons = {}
@@ -182,6 +218,22 @@ class PDFMergerApp:
             cursor='hand2'
         )
         
+        # Cancel button, shown in place of the process button while a job runs
+        self.cancel_btn = Button(
+            self.process_container,
+            text="Cancel",
+            command=self.cancel_job,
+            font=('Segoe UI', 12, 'bold'),
+            fg='white',
+            bg='#C42B1C',
+            activebackground='#A4262C',
+            activeforeground='white',
+            padx=30,
+            pady=10,
+            relief='raised',
+            cursor='hand2'
+        )
+        
         # Rotation options frame (for Rotate Pages feature)
         self.rotation_frame = Frame(main_frame, bg="#ffffff")
         self.rotation_var = StringVar(value="90")
@@ -205,6 +257,118 @@ class PDFMergerApp:
             )
             rb.pack(side='left', padx=5)
         
+        auto_rb = Radiobutton(
+            self.rotation_frame,
+            text="Auto",
+            value="auto",
+            variable=self.rotation_var,
+            font=('Segoe UI', 11),
+            bg="#ffffff"
+        )
+        auto_rb.pack(side='left', padx=5)
+        
+        self.rotation_relative_var = BooleanVar(value=False)
+        relative_cb = Checkbutton(
+            self.rotation_frame,
+            text="Add to current",
+            variable=self.rotation_relative_var,
+            font=('Segoe UI', 11),
+            bg="#ffffff"
+        )
+        relative_cb.pack(side='left', padx=5)
+        
+        pages_label = Label(
+            self.rotation_frame,
+            text="Pages:",
+            font=('Segoe UI', 11),
+            bg="#ffffff"
+        )
+        pages_label.pack(side='left', padx=5)
+        
+        # Blank for all pages, "odd", "even" or ranges such as "1-3,7"
+        self.rotation_pages_var = StringVar()
+        pages_entry = Entry(
+            self.rotation_frame,
+            textvariable=self.rotation_pages_var,
+            font=('Segoe UI', 11),
+            width=12
+        )
+        pages_entry.pack(side='left', padx=5)
+        
+        # Merge options frame (for Merge PDFs feature)
+        self.merge_frame = Frame(main_frame, bg="#ffffff")
+        self.merge_dedupe_var = BooleanVar(value=False)
+        
+        dedupe_cb = Checkbutton(
+            self.merge_frame,
+            text="Store shared fonts and images once",
+            variable=self.merge_dedupe_var,
+            font=('Segoe UI', 11),
+            bg="#ffffff"
+        )
+        dedupe_cb.pack(side='left', padx=5)
+        
+        # Compression options frame (for Compress PDF feature)
+        self.compress_frame = Frame(main_frame, bg="#ffffff")
+        self.compress_var = StringVar(value="lossless")
+        
+        compress_label = Label(
+            self.compress_frame,
+            text="Compression:",
+            font=('Segoe UI', 11),
+            bg="#ffffff"
+        )
+        compress_label.pack(side='left', padx=5)
+        
+        for preset, text in [("lossless", "Lossless"), ("print", "Print"), ("ebook", "eBook"), ("screen", "Screen")]:
+            rb = Radiobutton(
+                self.compress_frame,
+                text=text,
+                value=preset,
+                variable=self.compress_var,
+                font=('Segoe UI', 11),
+                bg="#ffffff"
+            )
+            rb.pack(side='left', padx=5)
+        
+        # Split options frame (for Split PDF feature)
+        self.split_frame = Frame(main_frame, bg="#ffffff")
+        self.split_mode_var = StringVar(value="Every page")
+        self.split_value_var = StringVar()
+        
+        split_label = Label(
+            self.split_frame,
+            text="Split Mode:",
+            font=('Segoe UI', 11),
+            bg="#ffffff"
+        )
+        split_label.pack(side='left', padx=5)
+        
+        split_mode_box = ttk.Combobox(
+            self.split_frame,
+            textvariable=self.split_mode_var,
+            values=list(SPLIT_MODES),
+            state="readonly",
+            width=18
+        )
+        split_mode_box.pack(side='left', padx=5)
+        
+        split_value_label = Label(
+            self.split_frame,
+            text="Value:",
+            font=('Segoe UI', 11),
+            bg="#ffffff"
+        )
+        split_value_label.pack(side='left', padx=5)
+        
+        split_value_entry = Entry(
+            self.split_frame,
+            textvariable=self.split_value_var,
+            font=('Segoe UI', 11),
+            width=20
+        )
+        split_value_entry.pack(side='left', padx=5)
+        
         # File List Frame
         self.list_frame = ttk.LabelFrame(main_frame, text="Selected Files", padding=10)
         self.list_frame.pack(fill='both', expand=True, pady=(0, 20))
@@ -212,7 +376,7 @@ class PDFMergerApp:
         # File list with scrollbar
         self.file_list = ttk.Treeview(
             self.list_frame,
-            columns=("Name", "Type", "Size"),
+            columns=("Name", "Type", "Size", "Pages", "Details", "Range"),
             show="headings",
             selectmode="extended"
         )
@@ -220,17 +384,48 @@ class PDFMergerApp:
         self.file_list.heading("Name", text="File Name")
         self.file_list.heading("Type", text="File Type")
         self.file_list.heading("Size", text="Size")
+        self.file_list.heading("Pages", text="Pages")
+        self.file_list.heading("Details", text="Details")
+        self.file_list.heading("Range", text="Use Pages")
         
         # Set column widths
-        self.file_list.column("Name", width=300)
-        self.file_list.column("Type", width=100)
-        self.file_list.column("Size", width=100)
+        self.file_list.column("Name", width=240)
+        self.file_list.column("Type", width=60)
+        self.file_list.column("Size", width=80)
+        self.file_list.column("Pages", width=60)
+        self.file_list.column("Details", width=110)
+        self.file_list.column("Range", width=90)
         
-        scrollbar = ttk.Scrollbar(self.list_frame, orient="vertical", command=self.file_list.yview)
-        self.file_list.configure(yscrollcommand=scrollbar.set)
+        self.file_scrollbar = ttk.Scrollbar(self.list_frame, orient="vertical", command=self.file_list.yview)
+        self.file_list.configure(yscrollcommand=self.on_file_list_scroll)
+        self.file_list.bind("<<TreeviewSelect>>", self.show_preview)
+        
+        # Merge mode: drag rows to reorder, double-click to pick pages
+        self.file_list.bind("<ButtonPress-1>", self.on_drag_start)
+        self.file_list.bind("<B1-Motion>", self.on_drag_motion)
+        self.file_list.bind("<Double-1>", self.edit_page_ranges)
+        self.drag_item = None
+        
+        # Preview pane with page thumbnails of the focused file. Pages are
+        # rendered off the UI thread, and only while they are on screen.
+        preview_frame = Frame(self.list_frame, bg="#ffffff")
+        self.preview_canvas = Canvas(
+            preview_frame,
+            width=THUMBNAIL_SIZE + 2 * PREVIEW_PADDING,
+            bg="#f5f5f5",
+            highlightthickness=0
+        )
+        preview_scrollbar = ttk.Scrollbar(preview_frame, orient="vertical", command=self.preview_yview)
+        self.preview_canvas.configure(yscrollcommand=preview_scrollbar.set)
+        self.preview_canvas.bind("<Configure>", lambda event: self.request_visible_pages())
+        self.preview_canvas.bind("<MouseWheel>", self.on_preview_wheel)
+        
+        self.preview_canvas.pack(side='left', fill='y')
+        preview_scrollbar.pack(side='right', fill='y')
+        preview_frame.pack(side='right', fill='y', padx=(10, 0))
         
         self.file_list.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        self.file_scrollbar.pack(side='right', fill='y')
         
         # Status bar
         self.status_label = Label(
@@ -243,11 +438,89 @@ class PDFMergerApp:
         )
         self.status_label.pack(fill='x', pady=(10, 0))
         
+        # Render options frame (for Render Pages feature)
+        self.render_frame = Frame(main_frame, bg="#ffffff")
+        render_format_row = Frame(self.render_frame, bg="#ffffff")
+        render_format_row.pack(fill='x')
+        render_color_row = Frame(self.render_frame, bg="#ffffff")
+        render_color_row.pack(fill='x')
+        self.render_format_var = StringVar(value="png")
+        self.render_dpi_var = StringVar(value="150")
+        self.render_color_var = StringVar(value="rgb")
+        self.render_multipage_var = BooleanVar(value=False)
+        
+        render_format_label = Label(
+            render_format_row,
+            text="Format:",
+            font=('Segoe UI', 11),
+            bg="#ffffff"
+        )
+        render_format_label.pack(side='left', padx=5)
+        
+        for fmt, text in [("png", "PNG"), ("jpeg", "JPEG"), ("tiff", "TIFF")]:
+            rb = Radiobutton(
+                render_format_row,
+                text=text,
+                value=fmt,
+                variable=self.render_format_var,
+                font=('Segoe UI', 11),
+                bg="#ffffff"
+            )
+            rb.pack(side='left', padx=5)
+        
+        render_dpi_label = Label(
+            render_format_row,
+            text="DPI:",
+            font=('Segoe UI', 11),
+            bg="#ffffff"
+        )
+        render_dpi_label.pack(side='left', padx=5)
+        
+        render_dpi_entry = Entry(
+            render_format_row,
+            textvariable=self.render_dpi_var,
+            font=('Segoe UI', 11),
+            width=5
+        )
+        render_dpi_entry.pack(side='left', padx=5)
+        
+        render_color_label = Label(
+            render_color_row,
+            text="Color:",
+            font=('Segoe UI', 11),
+            bg="#ffffff"
+        )
+        render_color_label.pack(side='left', padx=5)
+        
+        for color, text in [("rgb", "Color"), ("gray", "Grayscale"), ("bilevel", "Black & white")]:
+            rb = Radiobutton(
+                render_color_row,
+                text=text,
+                value=color,
+                variable=self.render_color_var,
+                font=('Segoe UI', 11),
+                bg="#ffffff"
+            )
+            rb.pack(side='left', padx=5)
+        
+        multipage_cb = Checkbutton(
+            render_color_row,
+            text="One multi-page TIFF",
+            variable=self.render_multipage_var,
+            font=('Segoe UI', 11),
+            bg="#ffffff"
+        )
+        multipage_cb.pack(side='left', padx=5)
+        
         # Initially hide file selection related widgets
         self.list_frame.pack_forget()
         self.action_frame.pack_forget()
         self.process_frame.pack_forget()
         self.rotation_frame.pack_forget()
+        self.split_frame.pack_forget()
+        self.compress_frame.pack_forget()
+        self.merge_frame.pack_forget()
+        self.render_frame.pack_forget()
     
     def select_feature(self, feature):
         # Reset previously selected feature
@@ -271,15 +544,23 @@ class PDFMergerApp:
             self.process_frame.pack(fill='x', pady=(0, 20))
             self.process_btn.pack()
             self.rotation_frame.pack_forget()
+            self.split_frame.pack_forget()
+            self.compress_frame.pack_forget()
+            self.merge_frame.pack(fill='x', pady=(0, 20))
+            self.render_frame.pack_forget()
             
         elif feature == "Split PDF":
-            self.select_btn.configure(text="Select PDF")
+            self.select_btn.configure(text="Select PDFs")
             self.select_btn.pack(side='left', padx=10)
-            self.remove_btn.pack_forget()
+            self.remove_btn.pack(side='left', padx=10)
             self.process_btn.configure(text="Split PDF", command=self.split_pdf)
             self.process_frame.pack(fill='x', pady=(0, 20))
             self.process_btn.pack()
             self.rotation_frame.pack_forget()
+            self.split_frame.pack(fill='x', pady=(0, 20))
+            self.compress_frame.pack_forget()
+            self.merge_frame.pack_forget()
+            self.render_frame.pack_forget()
             
         elif feature == "Convert to PDF":
             self.select_btn.configure(text="Select Images")
@@ -289,33 +570,72 @@ class PDFMergerApp:
             self.process_frame.pack(fill='x', pady=(0, 20))
             self.process_btn.pack()
             self.rotation_frame.pack_forget()
+            self.split_frame.pack_forget()
+            self.compress_frame.pack_forget()
+            self.merge_frame.pack_forget()
+            self.render_frame.pack_forget()
             
         elif feature == "Compress PDF":
-            self.select_btn.configure(text="Select PDF")
+            self.select_btn.configure(text="Select PDFs")
             self.select_btn.pack(side='left', padx=10)
-            self.remove_btn.pack_forget()
+            self.remove_btn.pack(side='left', padx=10)
             self.process_btn.configure(text="Compress PDF", command=self.compress_pdf)
             self.process_frame.pack(fill='x', pady=(0, 20))
             self.process_btn.pack()
             self.rotation_frame.pack_forget()
+            self.split_frame.pack_forget()
+            self.compress_frame.pack(fill='x', pady=(0, 20))
+            self.merge_frame.pack_forget()
+            self.render_frame.pack_forget()
             
         elif feature == "Extract Images":
-            self.select_btn.configure(text="Select PDF")
+            self.select_btn.configure(text="Select PDFs")
             self.select_btn.pack(side='left', padx=10)
-            self.remove_btn.pack_forget()
+            self.remove_btn.pack(side='left', padx=10)
             self.process_btn.configure(text="Extract Images", command=self.extract_images)
             self.process_frame.pack(fill='x', pady=(0, 20))
             self.process_btn.pack()
             self.rotation_frame.pack_forget()
+            self.split_frame.pack_forget()
+            self.compress_frame.pack_forget()
+            self.merge_frame.pack_forget()
+            self.render_frame.pack_forget()
             
         elif feature == "Rotate Pages":
-            self.select_btn.configure(text="Select PDF")
+            self.select_btn.configure(text="Select PDFs")
             self.select_btn.pack(side='left', padx=10)
-            self.remove_btn.pack_forget()
+            self.remove_btn.pack(side='left', padx=10)
             self.process_btn.configure(text="Rotate Pages", command=self.rotate_pages)
             self.process_frame.pack(fill='x', pady=(0, 20))
             self.process_btn.pack()
             self.rotation_frame.pack(fill='x', pady=(0, 20))
+            self.split_frame.pack_forget()
+            self.compress_frame.pack_forget()
+            self.merge_frame.pack_forget()
+            self.render_frame.pack_forget()
+            
+        elif feature == "Render Pages":
+            self.select_btn.configure(text="Select PDFs")
+            self.select_btn.pack(side='left', padx=10)
+            self.remove_btn.pack(side='left', padx=10)
+            self.process_btn.configure(text="Render Pages", command=self.render_pages)
+            self.process_frame.pack(fill='x', pady=(0, 20))
+            self.process_btn.pack()
+            self.rotation_frame.pack_forget()
+            self.split_frame.pack_forget()
+            self.compress_frame.pack_forget()
+            self.merge_frame.pack_forget()
+            self.render_frame.pack(fill='x', pady=(0, 20))
+        
+        # Page ranges only apply to merging
+        if feature == "Merge PDFs":
+            self.file_list.configure(displaycolumns=("Name", "Type", "Size", "Pages", "Details", "Range"))
+        else:
+            self.file_list.configure(displaycolumns=("Name", "Type", "Size", "Pages", "Details"))
+        
+        # Keep the cancel button in place while a job is still running
+        if self.current_job:
+            self.process_btn.pack_forget()
         
         self.update_status(f"Selected feature: {feature}")
     
@@ -337,6 +657,9 @@ class PDFMergerApp:
     def select_rotate(self):
         self.select_feature("Rotate Pages")
     
+    def select_render(self):
+        self.select_feature("Render Pages")
+    
     def add_files(self):
         if not self.current_feature:
             self.update_status("Please select a feature first")
@@ -348,12 +671,10 @@ class PDFMergerApp:
                 filetypes=[("PDF files", "*.pdf")]
             )
         elif self.current_feature == "Split PDF":
-            files = filedialog.askopenfilename(
-                title="Select a PDF file to split",
+            files = filedialog.askopenfilenames(
+                title="Select PDF files to split",
                 filetypes=[("PDF files", "*.pdf")]
             )
-            if files:  # Convert single file to tuple
-                files = (files,)
         elif self.current_feature == "Convert to PDF":
             files = filedialog.askopenfilenames(
                 title="Select images to convert",
@@ -363,299 +684,580 @@ class PDFMergerApp:
                 ]
             )
         elif self.current_feature == "Compress PDF":
-            files = filedialog.askopenfilename(
-                title="Select a PDF file to compress",
+            files = filedialog.askopenfilenames(
+                title="Select PDF files to compress",
                 filetypes=[("PDF files", "*.pdf")]
             )
-            if files:
-                files = (files,)
         elif self.current_feature == "Extract Images":
-            files = filedialog.askopenfilename(
-                title="Select a PDF file to extract images",
+            files = filedialog.askopenfilenames(
+                title="Select PDF files to extract images",
                 filetypes=[("PDF files", "*.pdf")]
             )
-            if files:
-                files = (files,)
         elif self.current_feature == "Rotate Pages":
-            files = filedialog.askopenfilename(
-                title="Select a PDF file to rotate",
+            files = filedialog.askopenfilenames(
+                title="Select PDF files to rotate",
+                filetypes=[("PDF files", "*.pdf")]
+            )
+        elif self.current_feature == "Render Pages":
+            files = filedialog.askopenfilenames(
+                title="Select PDF files to render",
                 filetypes=[("PDF files", "*.pdf")]
             )
-            if files:
-                files = (files,)
         
+        # Size, page count and the rest are filled in by background probes,
+        # so adding thousands of files from a slow share returns at once
         for file in files:
-            if file and file not in self.selected_files:
-                self.selected_files.append(file)
+            item = self.files.add(file) if file else None
+            if item:
                 file_name = os.path.basename(file)
                 file_ext = os.path.splitext(file)[1].upper()[1:]
-                file_size = os.path.getsize(file)
-                
-                # Show size in KB or MB based on size
-                if file_size > 1024*1024:
-                    size_text = f"{file_size/(1024*1024):.1f} MB"
-                else:
-                    size_text = f"{file_size/1024:.1f} KB"
-                
-                self.file_list.insert("", "end", values=(file_name, file_ext, size_text))
+                self.file_list.insert("", "end", iid=item, values=(file_name, file_ext, "...", "...", "", "All"))
         
         if files:
-            self.update_status(f"Added {len(files) if isinstance(files, tuple) else 1} file(s)")
+            self.update_status(f"Added {len(files)} file(s)")
     
     def remove_selected(self):
         selected_items = self.file_list.selection()
         for item in selected_items:
-            file_name = self.file_list.item(item)['values'][0]
-            file_path = next(f for f in self.selected_files if os.path.basename(f) == file_name)
-            self.selected_files.remove(file_path)
+            self.files.remove(item)
             self.file_list.delete(item)
         
         if selected_items:
+            self.show_preview()
             self.update_status(f"Removed {len(selected_items)} file(s)")
     
+    @property
+    def selected_files(self):
+        # Paths in list order, so dragging rows reorders the inputs
+        return [self.files[item].path for item in self.file_list.get_children()]
+    
+    def selected_size(self):
+        return sum(
+            info.size if info.size is not None else os.path.getsize(info.path)
+            for info in (self.files[item] for item in self.file_list.get_children())
+        )
+    
+    def item_path(self, item):
+        return self.files[item].path
+        
+    def poll_file_probes(self):
+        for item in self.files.poll():
+            info = self.files[item]
+            if info.error:
+                values = ("n/a", "n/a", f"Unreadable: {info.error}")
+            else:
+                details = []
+                if info.pdf_version:
+                    details.append(f"PDF {info.pdf_version}")
+                if info.encrypted:
+                    details.append("encrypted")
+                values = (format_size(info.size), info.page_count, ", ".join(details))
+            for column, value in zip(("Size", "Pages", "Details"), values):
+                self.file_list.set(item, column, value)
+        self.root.after(JOB_POLL_INTERVAL_MS, self.poll_file_probes)
+        
+    def on_drag_start(self, event):
+        self.drag_item = self.file_list.identify_row(event.y) or None
+        
+    def on_drag_motion(self, event):
+        if self.current_feature != "Merge PDFs" or not self.drag_item:
+            return
+        target = self.file_list.identify_row(event.y)
+        if not target or target == self.drag_item:
+            return
+            
+        self.file_list.move(self.drag_item, "", self.file_list.index(target))
+        
+    def edit_page_ranges(self, event):
+        import pdf_engine
+        item = self.file_list.identify_row(event.y)
+        if self.current_feature != "Merge PDFs" or not item:
+            return
+            
+        current = self.file_list.set(item, "Range")
+        spec = simpledialog.askstring(
+            "Pages",
+            "Pages to merge, in order (e.g. 1-3,7 or 5-). Leave empty for all pages:",
+            initialvalue="" if current == "All" else current,
+            parent=self.root
+        )
+        if spec is None:
+            return
+        spec = spec.replace(" ", "")
+        try:
+            if spec:
+                # Only the syntax can be checked before the file is opened
+                pdf_engine.parse_page_ranges(spec, sys.maxsize)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.file_list.set(item, "Range", spec or "All")
+        
+    def on_file_list_scroll(self, first, last):
+        self.file_scrollbar.set(first, last)
+        
+        # Warm the thumbnail cache with the first page of rows on screen
+        items = self.file_list.get_children()
+        start = int(float(first) * len(items))
+        stop = math.ceil(float(last) * len(items))
+        for item in items[start:stop]:
+            self.thumbnails.request(self.item_path(item))
+            
+    def show_preview(self, event=None):
+        focus = self.file_list.focus()
+        path = self.item_path(focus) if focus and self.file_list.exists(focus) else None
+        if path == self.preview_path:
+            return
+            
+        self.preview_path = path
+        self.preview_page_count = 1 if path else 0
+        self.preview_images.clear()
+        self.preview_canvas.delete("all")
+        self.preview_canvas.yview_moveto(0)
+        self.thumbnails.reset()
+        self.layout_preview()
+        
+    def layout_preview(self):
+        height = self.preview_page_count * PREVIEW_SLOT + PREVIEW_PADDING
+        self.preview_canvas.configure(scrollregion=(0, 0, THUMBNAIL_SIZE + 2 * PREVIEW_PADDING, height))
+        self.request_visible_pages()
+        
+    def request_visible_pages(self):
+        if not self.preview_path:
+            return
+            
+        top = self.preview_canvas.canvasy(0)
+        bottom = self.preview_canvas.canvasy(self.preview_canvas.winfo_height())
+        first = max(0, int(top // PREVIEW_SLOT))
+        last = min(self.preview_page_count - 1, int(bottom // PREVIEW_SLOT))
+        
+        # Drop pages that scrolled well out of view so memory stays capped
+        for page in list(self.preview_images):
+            if not first - PREVIEW_SLACK <= page <= last + PREVIEW_SLACK:
+                self.preview_canvas.delete(f"page{page}")
+                del self.preview_images[page]
+                
+        for page in range(first, last + 1):
+            if page not in self.preview_images:
+                self.thumbnails.request(self.preview_path, page)
+                
+    def preview_yview(self, *args):
+        self.preview_canvas.yview(*args)
+        self.request_visible_pages()
+        
+    def on_preview_wheel(self, event):
+        self.preview_canvas.yview_scroll(-1 if event.delta > 0 else 1, "units")
+        self.request_visible_pages()
+        
+    def poll_thumbnails(self):
+        for thumbnail in self.thumbnails.poll():
+            # Thumbnails for other files were prefetches and are cached already
+            if thumbnail.path != self.preview_path:
+                continue
+            if thumbnail.page_count != self.preview_page_count:
+                self.preview_page_count = thumbnail.page_count
+                self.layout_preview()
+            if thumbnail.page not in self.preview_images:
+                image = PhotoImage(data=base64.b64encode(thumbnail.png))
+                self.preview_images[thumbnail.page] = image
+                self.preview_canvas.create_image(
+                    PREVIEW_PADDING + THUMBNAIL_SIZE // 2,
+                    PREVIEW_PADDING + thumbnail.page * PREVIEW_SLOT,
+                    image=image,
+                    anchor='n',
+                    tags=f"page{thumbnail.page}"
+                )
+        self.root.after(JOB_POLL_INTERVAL_MS, self.poll_thumbnails)
+        
     def update_status(self, message):
         self.status_label.config(text=message)
-        self.root.update()
+        
+    def start_cached_job(self, name, operation, func, source, output, params, cache=True, on_success=None,
+                         **options):
+        # Runs func through the result cache, or directly when cache is off
+        # for jobs whose outputs are too big or written in place
+        if cache:
+            self.start_job(name, self.cache.run, operation, func, source, output, params, on_success=on_success,
+                           **options)
+        else:
+            self.start_job(name, func, source, output, on_success=on_success, **params, **options)
+            
+    def start_job(self, name, func, *args, on_success=None, **kwargs):
+        if self.current_job:
+            messagebox.showerror("Error", "Another operation is still running")
+            return
+            
+        self.current_job = self.jobs.submit(name, func, *args, **kwargs)
+        self.job_success_handler = on_success
+        self.process_btn.pack_forget()
+        self.cancel_btn.pack()
+        self.update_status(f"{name}...")
+        
+    def cancel_job(self):
+        if self.current_job:
+            self.current_job.cancel()
+            self.update_status(f"Cancelling: {self.current_job.name}")
+            
+    def poll_jobs(self):
+        for event in self.jobs.poll():
+            if event.kind == "progress":
+                done, total = event.payload
+                self.update_status(f"{event.job.name}: {done}/{total}")
+            else:
+                self.finish_job(event)
+        self.root.after(JOB_POLL_INTERVAL_MS, self.poll_jobs)
+        
+    def finish_job(self, event):
+        on_success = self.job_success_handler
+        self.current_job = None
+        self.job_success_handler = None
+        self.cancel_btn.pack_forget()
+        self.process_btn.pack()
+        
+        if event.kind == "done":
+            message = event.payload.message
+            if "cache" in getattr(event.payload, "stats", {}):
+                message = f"{message} ({self.cache.summary()})"
+            self.update_status(message)
+            if on_success:
+                on_success(event.payload)
+        elif event.kind == "cancelled":
+            self.update_status(f"{event.job.name} cancelled")
+        else:
+            self.update_status("Error occurred")
+            messagebox.showerror("Error", f"An error occurred: {str(event.payload)}")
+            
+    def on_close(self):
+        self.jobs.shutdown()
+        self.files.shutdown()
+        self.thumbnails.close()
+        self.root.destroy()
         
     def merge_pdfs(self):
+        import pdf_engine
         if not self.selected_files:
             messagebox.showerror("Error", "Please select PDF files first")
             return
             
-        try:
-            save_path = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF Files", "*.pdf")],
-                title="Save Merged PDF"
+        save_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF Files", "*.pdf")],
+            title="Save Merged PDF"
+        )
+        
+        if save_path:
+            total_size = self.selected_size()
+            page_ranges = [self.file_list.set(item, "Range") for item in self.file_list.get_children()]
+            streaming = total_size > STREAMING_THRESHOLD
+            self.start_cached_job(
+                "Merging PDFs",
+                "merge",
+                pdf_engine.merge_pdfs,
+                list(self.selected_files),
+                save_path,
+                {
+                    "page_ranges": [None if spec == "All" else spec for spec in page_ranges],
+                    "dedupe": self.merge_dedupe_var.get()
+                },
+                cache=not streaming,
+                streaming=streaming,
+                on_success=lambda result: messagebox.showinfo("Success", "PDFs merged successfully!")
             )
             
-            if save_path:
-                merger = PdfMerger()
-                for pdf in self.selected_files:
-                    merger.append(pdf)
-                merger.write(save_path)
-                merger.close()
-                self.update_status("PDFs merged successfully")
-                messagebox.showinfo("Success", "PDFs merged successfully!")
-        except Exception as e:
-            self.update_status("Error occurred")
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
-            
     def split_pdf(self):
+        import pdf_engine
         if not self.selected_files:
             messagebox.showerror("Error", "Please select a PDF file first")
             return
         
-        if len(self.selected_files) > 1:
-            messagebox.showerror("Error", "Please select only one PDF file")
+        mode = SPLIT_MODES[self.split_mode_var.get()]
+        value = self.split_value_var.get().strip()
+        try:
+            if mode == "every":
+                value = int(value)
+            elif mode == "bookmarks":
+                value = int(value) if value else 1
+            elif mode == "size":
+                value = float(value)
+            elif mode == "ranges" and not value:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid value for the split mode")
             return
             
-        try:
-            pdf_path = self.selected_files[0]
-            pdf = PdfReader(pdf_path)
-            num_pages = len(pdf.pages)
+        if len(self.selected_files) > 1:
+            options = {"mode": mode, "value": value} if mode != "page" else {}
+            self.run_batch("split", options)
+            return
             
-            save_dir = filedialog.askdirectory(title="Select Output Directory")
-            if not save_dir:
-                return
-                
-            base_name = Path(pdf_path).stem
+        save_dir = filedialog.askdirectory(title="Select Output Directory")
+        if not save_dir:
+            return
             
-            for page_num in range(num_pages):
-                pdf_writer = PdfWriter()
-                pdf_writer.add_page(pdf.pages[page_num])
-                
-                output_path = os.path.join(save_dir, f"{base_name}_page_{page_num + 1}.pdf")
-                with open(output_path, "wb") as output_file:
-                    pdf_writer.write(output_file)
-                    
-            self.update_status(f"PDF split into {num_pages} pages")
-            messagebox.showinfo("Success", f"PDF split into {num_pages} pages!")
-        except Exception as e:
-            self.update_status("Error occurred")
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+        self.start_job(
+            "Splitting PDF",
+            pdf_engine.split_pdf,
+            self.selected_files[0],
+            save_dir,
+            mode=mode,
+            value=value if mode != "page" else None,
+            workers=WORKER_PROCESSES,
+            on_success=lambda result: messagebox.showinfo("Success", f"{result.message}!")
+        )
             
     def convert_to_pdf(self):
+        import pdf_engine
         if not self.selected_files:
             messagebox.showerror("Error", "Please select image files first")
             return
             
-        try:
-            save_path = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF Files", "*.pdf")],
-                title="Save PDF"
+        save_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF Files", "*.pdf")],
+            title="Save PDF"
+        )
+        
+        if save_path:
+            total_size = self.selected_size()
+            streaming = total_size > STREAMING_THRESHOLD
+            self.start_cached_job(
+                "Converting images",
+                "convert",
+                pdf_engine.convert_to_pdf,
+                list(self.selected_files),
+                save_path,
+                {},
+                cache=not streaming,
+                streaming=streaming,
+                workers=WORKER_PROCESSES,
+                on_success=lambda result: messagebox.showinfo("Success", "Images converted to PDF successfully!")
             )
             
-            if save_path:
-                image_list = []
-                for img_path in self.selected_files:
-                    if Path(img_path).suffix.lower() in ['.png', '.jpg', '.jpeg', '.bmp', '.tiff']:
-                        with open(img_path, 'rb') as img_file:
-                            image_list.append(img_file.read())
-                
-                if image_list:
-                    with open(save_path, "wb") as pdf_file:
-                        pdf_file.write(img2pdf.convert(image_list))
-                    self.update_status("Images converted to PDF successfully")
-                    messagebox.showinfo("Success", "Images converted to PDF successfully!")
-                else:
-                    messagebox.showerror("Error", "No valid image files selected")
-        except Exception as e:
-            self.update_status("Error occurred")
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
-            
     def compress_pdf(self):
+        import pdf_engine
         if not self.selected_files:
             messagebox.showerror("Error", "Please select a PDF file first")
             return
             
         if len(self.selected_files) > 1:
-            messagebox.showerror("Error", "Please select only one PDF file")
+            self.run_batch("compress", {"preset": self.compress_var.get()})
             return
             
-        try:
-            pdf_path = self.selected_files[0]
-            doc = fitz.open(pdf_path)
-            
-            save_path = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF Files", "*.pdf")],
-                title="Save Compressed PDF"
+        save_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF Files", "*.pdf")],
+            title="Save Compressed PDF"
+        )
+        
+        if save_path:
+            self.start_cached_job(
+                "Compressing PDF",
+                "compress",
+                pdf_engine.compress_pdf,
+                self.selected_files[0],
+                save_path,
+                {"preset": self.compress_var.get()},
+                workers=WORKER_PROCESSES,
+                on_success=self.show_compression_report
             )
             
-            if save_path:
-                doc.save(save_path, garbage=4, deflate=True, clean=True)
-                doc.close()
-                
-                original_size = os.path.getsize(pdf_path)
-                compressed_size = os.path.getsize(save_path)
-                reduction = (original_size - compressed_size) / original_size * 100
-                
-                self.update_status(f"PDF compressed successfully ({reduction:.1f}% reduction)")
-                messagebox.showinfo("Success", f"PDF compressed successfully!\nSize reduction: {reduction:.1f}%")
-        except Exception as e:
-            self.update_status("Error occurred")
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+    def show_compression_report(self, result):
+        lines = [f"PDF compressed successfully!\nSize reduction: {result.stats['reduction']:.1f}%"]
+        for kind, sizes in result.stats.get("saved_by_class", {}).items():
+            if sizes["saved"] > 0:
+                lines.append(f"{kind.capitalize()}: {format_size(sizes['saved'])} saved")
+        messagebox.showinfo("Success", "\n".join(lines))
             
     def extract_images(self):
+        import pdf_engine
         if not self.selected_files:
             messagebox.showerror("Error", "Please select a PDF file first")
             return
             
         if len(self.selected_files) > 1:
-            messagebox.showerror("Error", "Please select only one PDF file")
+            self.run_batch("extract", {})
             return
             
-        try:
-            pdf_path = self.selected_files[0]
-            doc = fitz.open(pdf_path)
+        save_dir = filedialog.askdirectory(title="Select Output Directory")
+        if not save_dir:
+            return
             
-            save_dir = filedialog.askdirectory(title="Select Output Directory")
-            if not save_dir:
-                return
-                
-            image_count = 0
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                images = page.get_images()
-                
-                for img_index, img in enumerate(images):
-                    xref = img[0]
-                    base_image = doc.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    
-                    image_ext = base_image["ext"]
-                    image_path = os.path.join(save_dir, f"image_{page_num + 1}_{img_index + 1}.{image_ext}")
-                    
-                    with open(image_path, "wb") as image_file:
-                        image_file.write(image_bytes)
-                        image_count += 1
-            
-            doc.close()
-            self.update_status(f"Extracted {image_count} images from PDF")
-            messagebox.showinfo("Success", f"Extracted {image_count} images from PDF!")
-        except Exception as e:
-            self.update_status("Error occurred")
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+        self.start_job(
+            "Extracting images",
+            pdf_engine.extract_images,
+            self.selected_files[0],
+            save_dir,
+            workers=WORKER_PROCESSES,
+            on_success=lambda result: messagebox.showinfo("Success", f"{result.message}!")
+        )
             
     def rotate_pages(self):
+        import pdf_engine
         if not self.selected_files:
             messagebox.showerror("Error", "Please select a PDF file first")
             return
             
+        rotation = self.rotation_var.get()
+        
+        if rotation not in ["90", "180", "270", "auto"]:
+            messagebox.showerror("Error", "Invalid rotation angle")
+            return
+            
+        options = {
+            "rotation": 0 if rotation == "auto" else int(rotation),
+            "auto": rotation == "auto",
+            "relative": self.rotation_relative_var.get(),
+            "pages": self.rotation_pages_var.get().strip() or None
+        }
+            
         if len(self.selected_files) > 1:
-            messagebox.showerror("Error", "Please select only one PDF file")
+            self.run_batch("rotate", options)
+            return
+            
+        # Saving over the original lets the engine append only the changes
+        save_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF Files", "*.pdf")],
+            title="Save Rotated PDF"
+        )
+        
+        if not save_path:
+            return
+            
+        # The cache would hash and copy the whole file, undoing the incremental save
+        self.start_cached_job(
+            "Rotating pages",
+            "rotate",
+            pdf_engine.rotate_pages,
+            self.selected_files[0],
+            save_path,
+            options,
+            cache=not pdf_engine.same_file(self.selected_files[0], save_path),
+            on_success=lambda result: messagebox.showinfo("Success", f"{result.message}!")
+        )
+            
+    def render_pages(self):
+        import pdf_engine
+        if not self.selected_files:
+            messagebox.showerror("Error", "Please select a PDF file first")
             return
             
         try:
-            pdf_path = self.selected_files[0]
-            doc = fitz.open(pdf_path)
+            dpi = int(self.render_dpi_var.get())
+        except ValueError:
+            dpi = 0
+        if not 1 <= dpi <= 2400:
+            messagebox.showerror("Error", "DPI must be a number from 1 to 2400")
+            return
             
-            rotation = self.rotation_var.get()
+        fmt = self.render_format_var.get()
+        multipage = self.render_multipage_var.get()
+        if multipage and fmt != "tiff":
+            messagebox.showerror("Error", "Only TIFF output can hold several pages")
+            return
             
-            if rotation not in ["90", "180", "270"]:
-                messagebox.showerror("Error", "Invalid rotation angle")
-                return
-                
-            save_path = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF Files", "*.pdf")],
-                title="Save Rotated PDF"
-            )
+        options = {"fmt": fmt, "dpi": dpi, "color": self.render_color_var.get(), "multipage": multipage}
             
-            if save_path:
-                for page in doc:
-                    page.set_rotation(int(rotation))
-                doc.save(save_path)
-                doc.close()
-                
-                self.update_status("PDF rotated successfully")
-                messagebox.showinfo("Success", "PDF rotated successfully!")
-        except Exception as e:
-            self.update_status("Error occurred")
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+        if len(self.selected_files) > 1:
+            self.run_batch("render", options)
+            return
+            
+        save_dir = filedialog.askdirectory(title="Select Output Directory")
+        if not save_dir:
+            return
+            
+        self.start_job(
+            "Rendering pages",
+            pdf_engine.render_pages,
+            self.selected_files[0],
+            save_dir,
+            workers=WORKER_PROCESSES,
+            on_success=lambda result: messagebox.showinfo("Success", f"{result.message}!"),
+            **options
+        )
+            
+    def run_batch(self, tool, options):
+        import pdf_batch
+        save_dir = filedialog.askdirectory(title="Select Output Directory")
+        if not save_dir:
+            return
+            
+        self.start_job(
+            f"Batch {tool}",
+            pdf_batch.run_batch,
+            tool,
+            list(self.selected_files),
+            save_dir,
+            options=options,
+            workers=WORKER_PROCESSES,
+            on_success=self.show_batch_report
+        )
+        
+    def show_batch_report(self, result):
+        if not result.failed:
+            messagebox.showinfo("Success", f"{result.message}!")
+            return
+            
+        lines = [result.message, ""]
+        for record in result.failed[:10]:
+            lines.append(f"{os.path.basename(record['input'])}: {record['error']}")
+        if len(result.failed) > 10:
+            lines.append(f"...and {len(result.failed) - 10} more")
+        messagebox.showwarning("Batch Finished With Errors", "\n".join(lines))
             
     def check_for_updates(self):
-        try:
-            response = requests.get(UPDATE_URL)
-            if response.status_code == 200:
-                latest_version = response.json()["tag_name"].replace("v", "")
-                if self._is_newer_version(latest_version):
-                    if messagebox.askyesno("Update Available", 
-                        f"A new version {latest_version} is available. Would you like to update?"):
-                        self.download_update(response.json()["assets"][0]["browser_download_url"])
-        except Exception as e:
-            print(f"Failed to check for updates: {e}")
+        # Runs on a background thread with a timeout; poll_updates picks up the answer
+        self.updates.start()
+        self.root.after(JOB_POLL_INTERVAL_MS, self.poll_updates)
+        
+    def poll_updates(self):
+        # Checked before polling, so a result that lands in between isn't missed
+        running = self.updates.running
+        release = self.updates.poll()
+        if release is None:
+            if running:
+                self.root.after(JOB_POLL_INTERVAL_MS, self.poll_updates)
+            return
+            
+        latest_version = release["version"]
+        if release["download_url"] and pdf_updates.is_newer_version(latest_version, CURRENT_VERSION):
+            if messagebox.askyesno("Update Available", 
+                f"A new version {latest_version} is available. Would you like to update?"):
+                self.download_update(release)
             
-    def _is_newer_version(self, latest_version):
-        current = [int(x) for x in CURRENT_VERSION.split(".")]
-        latest = [int(x) for x in latest_version.split(".")]
-        return latest > current
+    def download_update(self, release):
+        # Downloaded next to the executable, so the final move is a rename on
+        # the same disk. An interrupted download resumes on the next attempt.
+        update_file = os.path.join(os.path.dirname(sys.executable), "PDF_Merger_new.exe")
+        self.start_job(
+            "Downloading update",
+            pdf_updates.download_update,
+            release,
+            update_file,
+            on_success=self.install_update
+        )
         
-    def download_update(self, download_url):
+    def install_update(self, result):
+        update_file = result.outputs[0]
+        update_script = os.path.join(os.path.dirname(update_file), "update.bat")
         try:
-            response = requests.get(download_url)
-            if response.status_code == 200:
-                update_file = "PDF_Merger_new.exe"
-                with open(update_file, "wb") as f:
-                    f.write(response.content)
-                    
-                # Create update batch script
-                with open("update.bat", "w") as f:
-                    f.write(f'''@echo off
-                        timeout /t 2 /nobreak
-                        move /y "{update_file}" "{sys.executable}"
-                        start "" "{sys.executable}"
-                        del "%~f0"
-                        ''')
-                
-                os.system("start update.bat")
-                self.root.quit()
+            # Create update batch script
+            with open(update_script, "w") as f:
+                f.write(f'''@echo off
+                    timeout /t 2 /nobreak
+                    move /y "{update_file}" "{sys.executable}"
+                    start "" "{sys.executable}"
+                    del "%~f0"
+                    ''')
+            
+            os.system(f'start "" "{update_script}"')
+            self.root.quit()
         except Exception as e:
-            messagebox.showerror("Update Failed", f"Failed to download update: {e}")
+            messagebox.showerror("Update Failed", f"Failed to install update: {e}")
 
 def main():
+    # Needed for the split worker processes in the frozen Windows build
+    multiprocessing.freeze_support()
     root = Tk()
     app = PDFMergerApp(root)
     
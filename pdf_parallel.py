@@ -0,0 +1,58 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+class OperationCancelled(Exception):
+    pass
+
+
+def report(progress, done, total):
+    # Progress callbacks may raise OperationCancelled to stop between pages
+    if progress is not None:
+        progress(done, total)
+
+
+def shard_items(items, workers):
+    # A few shards per worker keeps the pool busy and progress granular
+    shard_size = max(1, -(-len(items) // (workers * 4)))
+    return [items[start:start + shard_size] for start in range(0, len(items), shard_size)]
+
+
+def run_shards(func, tasks, workers, progress=None):
+    # tasks are (args, weight) pairs. Runs func(*args) for each on a process
+    # pool, reports progress by weight and returns results in task order.
+    total = sum(weight for _, weight in tasks)
+    results = {}
+    done = 0
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        futures = {pool.submit(func, *args): index for index, (args, _) in enumerate(tasks)}
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                done += tasks[index][1]
+                report(progress, done, total)
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    return [results[index] for index in range(len(tasks))]
+
+
+def ordered_map(func, items, workers, window=None, initializer=None, initargs=()):
+    # Yields func(item) in input order from a process pool, with at most
+    # `window` results in flight so memory stays bounded. initializer runs
+    # once in each worker, e.g. to open a document every task then shares.
+    window = window or workers * 2
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        try:
+            for item in items:
+                pending.append(pool.submit(func, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
@@ -0,0 +1,145 @@
+import json
+import os
+import time
+from dataclasses import dataclass, field
+
+import fitz  # PyMuPDF
+
+import pdf_compress
+import pdf_engine
+from pdf_metrics import peak_rss
+from pdf_parallel import report
+from pdf_trace import span, traced
+
+PIPELINE_STEPS = ["convert", "merge", "rotate", "compress"]
+# Steps that add pages; a pipeline starts with one of these
+INPUT_STEPS = ["convert", "merge"]
+
+
+@dataclass
+class Stage:
+    op: str
+    params: dict = field(default_factory=dict)
+
+
+def parse_stage(step):
+    # "compress", {"op": "compress", "preset": "ebook"} or a Stage
+    if isinstance(step, Stage):
+        stage = step
+    elif isinstance(step, str):
+        stage = Stage(step)
+    elif isinstance(step, dict):
+        params = dict(step)
+        stage = Stage(params.pop("op", None), params)
+    else:
+        raise ValueError(f"Invalid pipeline step: {step!r}")
+    if stage.op not in PIPELINE_STEPS:
+        raise ValueError(f"Unknown pipeline step: {stage.op}")
+    return stage
+
+
+def load_pipeline(path):
+    # A JSON (or, with PyYAML installed, YAML) object with "steps" and
+    # optionally "inputs" and "output"
+    with open(path) as f:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("YAML pipelines need PyYAML (pip install pyyaml)")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    if not isinstance(spec, dict) or not spec.get("steps"):
+        raise ValueError(f"{path} defines no pipeline steps")
+    return spec
+
+
+def _input_part(item):
+    # "file.pdf@1-3" or {"path": "file.pdf", "pages": "1-3"} -> (path, spec)
+    if isinstance(item, dict):
+        return item["path"], item.get("pages")
+    return pdf_engine.merge_part(os.fspath(item))
+
+
+def _is_image(path):
+    return os.path.splitext(path)[1].lower() in pdf_engine.IMAGE_EXTENSIONS
+
+
+def _run_stage(doc, stage, remaining, sources, workers):
+    # Applies one stage to doc. Input stages without their own "inputs" take
+    # the pipeline inputs that no earlier stage used; returns those left.
+    params = dict(stage.params)
+    if stage.op == "convert":
+        images = params.pop("inputs", None)
+        if images is None:
+            images = [item for item in remaining if _is_image(_input_part(item)[0])]
+            remaining = [item for item in remaining if item not in images]
+        pdf_engine.insert_images(doc, [_input_part(item)[0] for item in images], workers=workers, **params)
+    elif stage.op == "merge":
+        items = params.pop("inputs", None)
+        # Shared objects are merged when the document is saved
+        params.pop("dedupe", None)
+        if items is None:
+            items, remaining = remaining, []
+        if not items:
+            raise ValueError("Nothing left to merge")
+        pdf_engine.insert_parts(doc, [_input_part(item) for item in items], sources, **params)
+    elif stage.op == "rotate":
+        pdf_engine.rotate_document(doc, **params)
+    elif stage.op == "compress":
+        options = pdf_compress.resolve_options(params.pop("preset", None), **params)
+        pdf_engine.compress_document(doc, options, workers)
+    return remaining
+
+
+@traced("pipeline")
+def run_pipeline(steps, output, inputs=None, workers=1, progress=None):
+    # Runs steps on a single in-memory document and writes it once at the
+    # end, instead of saving and re-parsing a file between every tool.
+    # Steps are names or {"op": ..., **params} with the engine's parameter
+    # names, e.g. ["merge", {"op": "rotate", "rotation": 90, "pages": "odd"},
+    # {"op": "compress", "preset": "ebook"}].
+    stages = [parse_stage(step) for step in steps]
+    if not stages or stages[0].op not in INPUT_STEPS:
+        raise ValueError("A pipeline must start with convert or merge")
+
+    remaining = list(inputs or [])
+    timings = []
+    sources = {}
+    doc = fitz.open()
+    try:
+        for index, stage in enumerate(stages):
+            start = time.perf_counter()
+            with span(stage.op, stage=index):
+                remaining = _run_stage(doc, stage, remaining, sources, workers)
+            timings.append({"op": stage.op, "seconds": time.perf_counter() - start, "pages": len(doc)})
+            report(progress, index + 1, len(stages) + 1)
+
+        page_count = len(doc)
+        if not page_count:
+            raise ValueError("The pipeline produced no pages")
+        if any(stage.op == "compress" for stage in stages):
+            save_options = pdf_engine.COMPRESS_SAVE_OPTIONS
+        elif any(stage.op == "merge" and stage.params.get("dedupe") for stage in stages):
+            # Stores identical fonts, images and color profiles once, as merge --dedupe does
+            save_options = {"garbage": 4}
+        else:
+            save_options = {}
+        start = time.perf_counter()
+        with span("write", pages=page_count):
+            doc.save(output, **save_options)
+        timings.append({"op": "write", "seconds": time.perf_counter() - start, "pages": page_count})
+        report(progress, len(stages) + 1, len(stages) + 1)
+    finally:
+        doc.close()
+        for src, _ in sources.values():
+            src.close()
+
+    return pdf_engine.OperationResult(
+        "pipeline",
+        outputs=[output],
+        page_count=page_count,
+        message=f"Pipeline finished: {' -> '.join(stage.op for stage in stages)}",
+        stats={"stages": timings, "unused_inputs": len(remaining), "peak_rss": peak_rss()}
+    )
@@ -0,0 +1,138 @@
+import hashlib
+import itertools
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+# Probes mostly wait on disk or network reads, so a few run side by side
+PROBE_WORKERS = 4
+HASH_CHUNK_SIZE = 1024 * 1024
+PDF_HEADER = re.compile(rb"%PDF-(\d\.\d)")
+
+
+@dataclass
+class FileInfo:
+    path: str
+    size: int = None
+    page_count: int = None
+    encrypted: bool = None
+    pdf_version: str = None
+    content_hash: str = None
+    error: str = None
+
+    @property
+    def probed(self):
+        return self.content_hash is not None or self.error is not None
+
+
+def content_hash(path, header=None):
+    # sha256 of the file contents. header, a bytearray, receives the first
+    # chunk so callers can sniff the file type without a second read.
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            if header is not None and not header:
+                header.extend(chunk)
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def probe_file(path):
+    # Worker-thread entry point; fills in everything but the path
+    info = FileInfo(path)
+    try:
+        info.size = os.path.getsize(path)
+        header = bytearray()
+        info.content_hash = content_hash(path, header)
+        match = PDF_HEADER.search(header[:1024])
+        if not match:
+            # Images are one page each when converted
+            info.page_count = 1
+            return info
+
+        info.pdf_version = match.group(1).decode()
+        import fitz  # PyMuPDF
+        doc = fitz.open(path)
+        try:
+            info.encrypted = doc.needs_pass or doc.is_encrypted
+            info.page_count = len(doc)
+        finally:
+            doc.close()
+    except Exception as e:
+        info.error = str(e)
+    return info
+
+
+class FileRegistry:
+    # Selected files keyed by a stable item id, which the GUI also uses as the
+    # Treeview iid. add() returns at once; probe_file runs on worker threads
+    # and finished entries are collected on the caller's thread with poll().
+    def __init__(self, max_workers=PROBE_WORKERS):
+        self._entries = {}
+        self._by_path = {}
+        self._futures = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="probe")
+        self.results = queue.Queue()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, item_id):
+        return item_id in self._entries
+
+    def __getitem__(self, item_id):
+        return self._entries[item_id]
+
+    def find(self, path):
+        return self._by_path.get(os.path.abspath(path))
+
+    def add(self, path):
+        # Returns the new item id, or None when the file is already listed
+        key = os.path.abspath(path)
+        if key in self._by_path:
+            return None
+        item_id = f"file{next(self._ids)}"
+        self._entries[item_id] = FileInfo(path)
+        self._by_path[key] = item_id
+        with self._lock:
+            self._futures[item_id] = self._pool.submit(self._probe, item_id, path)
+        return item_id
+
+    def remove(self, item_id):
+        info = self._entries.pop(item_id)
+        del self._by_path[os.path.abspath(info.path)]
+        with self._lock:
+            future = self._futures.pop(item_id, None)
+        if future:
+            future.cancel()
+
+    def poll(self):
+        # Applies finished probes and returns the ids that changed
+        updated = []
+        while True:
+            try:
+                item_id, info = self.results.get_nowait()
+            except queue.Empty:
+                return updated
+            # Entries removed while their probe was running are dropped
+            if item_id in self._entries:
+                self._entries[item_id] = info
+                updated.append(item_id)
+
+    def pending(self):
+        with self._lock:
+            return len(self._futures)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _probe(self, item_id, path):
+        info = probe_file(path)
+        with self._lock:
+            self._futures.pop(item_id, None)
+        self.results.put((item_id, info))
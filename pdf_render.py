@@ -0,0 +1,96 @@
+import io
+import os
+
+import fitz  # PyMuPDF
+
+RENDER_FORMATS = ["png", "jpeg", "tiff"]
+RENDER_COLORS = ["rgb", "gray", "cmyk", "bilevel"]
+FORMAT_EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "tiff": ".tif"}
+DEFAULT_DPI = 150
+JPEG_QUALITY = 85
+# Group 4 fax compression is what OCR and archive systems expect for black
+# and white pages; everything else gets lossless deflate
+TIFF_COMPRESSION = {"bilevel": "group4"}
+DEFAULT_TIFF_COMPRESSION = "tiff_deflate"
+
+# The document each worker process renders from, opened once by open_worker
+_worker_doc = None
+
+
+def check_options(fmt, color, alpha):
+    if fmt not in RENDER_FORMATS:
+        raise ValueError(f"Unknown image format: {fmt}")
+    if color not in RENDER_COLORS:
+        raise ValueError(f"Unknown color mode: {color}")
+    if alpha and (fmt == "jpeg" or color != "rgb"):
+        raise ValueError("Transparency needs RGB PNG or TIFF output")
+    if fmt == "png" and color == "cmyk":
+        raise ValueError("PNG can't store CMYK; use TIFF or JPEG")
+
+
+def open_worker(source):
+    # Process-pool initializer
+    global _worker_doc
+    _worker_doc = fitz.open(source)
+
+
+def render_page(doc, page_num, dpi=DEFAULT_DPI, color="rgb", alpha=False):
+    colorspace = {"gray": fitz.csGRAY, "bilevel": fitz.csGRAY, "cmyk": fitz.csCMYK}.get(color, fitz.csRGB)
+    pixmap = doc[page_num].get_pixmap(dpi=dpi, colorspace=colorspace, alpha=alpha)
+    pixmap.set_dpi(dpi, dpi)
+    return pixmap
+
+
+def encode_pixmap(pixmap, fmt="png", color="rgb", dpi=DEFAULT_DPI, jpeg_quality=JPEG_QUALITY):
+    # MuPDF writes plain PNGs itself; Pillow handles JPEG, TIFF and 1-bit output
+    if fmt == "png" and color != "bilevel":
+        return pixmap.tobytes("png")
+
+    from PIL import Image
+    mode = {1: "L", 3: "RGB", 4: "CMYK"}[pixmap.n] if not pixmap.alpha else "RGBA"
+    image = Image.frombytes(mode, (pixmap.width, pixmap.height), pixmap.samples)
+    if color == "bilevel":
+        image = image.convert("1")
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.save(buffer, "JPEG", quality=jpeg_quality, dpi=(dpi, dpi))
+    elif fmt == "tiff":
+        image.save(buffer, "TIFF", compression=TIFF_COMPRESSION.get(color, DEFAULT_TIFF_COMPRESSION), dpi=(dpi, dpi))
+    else:
+        image.save(buffer, "PNG", dpi=(dpi, dpi))
+    return buffer.getvalue()
+
+
+def render_to_bytes(doc, page_num, fmt, color, dpi, alpha, jpeg_quality):
+    pixmap = render_page(doc, page_num, dpi, color, alpha)
+    return encode_pixmap(pixmap, fmt, color, dpi, jpeg_quality)
+
+
+def render_task(task, fmt, color, dpi, alpha, jpeg_quality, doc=None):
+    # Worker-process entry point. task is (page number, output path); with
+    # no path the encoded page is returned for the caller to write.
+    page_num, path = task
+    data = render_to_bytes(doc or _worker_doc, page_num, fmt, color, dpi, alpha, jpeg_quality)
+    if path is None:
+        return page_num, data
+    with open(path, "wb") as f:
+        f.write(data)
+    return page_num, len(data)
+
+
+def write_multipage_tiff(path, pages):
+    # Appends encoded single-page TIFFs to path as they arrive, so memory
+    # holds one page however long the document is. The file only appears
+    # under its name once every page is in.
+    from PIL import TiffImagePlugin
+    part_path = os.fspath(path) + ".part"
+    try:
+        with TiffImagePlugin.AppendingTiffWriter(part_path, True) as tiff:
+            for data in pages:
+                tiff.write(data)
+                tiff.newFrame()
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    os.replace(part_path, path)
@@ -0,0 +1,234 @@
+import os
+import sqlite3
+import time
+
+import fitz  # PyMuPDF
+
+from pdf_cache import user_cache_dir
+from pdf_engine import OperationResult, page_texts
+from pdf_parallel import ordered_map, report
+from pdf_registry import content_hash
+from pdf_trace import span, traced
+
+INDEX_ENV_VAR = "PDF_MERGER_INDEX"
+# Bump when the schema or the text extraction changes; older indexes are rebuilt
+INDEX_VERSION = 1
+# Page rows get rowid (document id << PAGE_BITS) | page number, so a
+# document's pages are one rowid range that can be deleted without a scan
+PAGE_BITS = 20
+MAX_PAGES = (1 << PAGE_BITS) - 1
+# Files written between commits; a crash loses at most this many
+COMMIT_EVERY = 50
+SNIPPET_TOKENS = 12
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    hash TEXT UNIQUE NOT NULL,
+    pages INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    document INTEGER NOT NULL REFERENCES documents(id),
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_document ON files(document);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(text, tokenize = 'unicode61');
+"""
+
+
+def default_index_path():
+    return os.environ.get(INDEX_ENV_VAR) or os.path.join(user_cache_dir(), "search.sqlite3")
+
+
+def phrase_query(text):
+    # Quotes every word so input such as INV-2024-0042 or C++ is matched
+    # literally instead of being read as FTS5 query syntax
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+def _hash_file(path):
+    # Worker-process entry point
+    try:
+        return path, content_hash(path), None
+    except OSError as e:
+        return path, None, str(e)
+
+
+def _read_text(path):
+    # Worker-process entry point; never raises so one bad file can't stop an update
+    try:
+        doc = fitz.open(path)
+        try:
+            if doc.needs_pass:
+                raise ValueError("encrypted")
+            if len(doc) > MAX_PAGES:
+                raise ValueError(f"more than {MAX_PAGES} pages")
+            return path, page_texts(doc), None
+        finally:
+            doc.close()
+    except Exception as e:
+        return path, None, str(e)
+
+
+def _map(func, items, workers):
+    if workers <= 1:
+        return map(func, items)
+    return ordered_map(func, items, workers)
+
+
+class SearchIndex:
+    # Full-text index of PDF pages in SQLite FTS5. Text is stored once per
+    # distinct file content, so copies and renames cost nothing, and
+    # update() only reads files whose size or mtime changed.
+    def __init__(self, path=None):
+        self.path = path or default_index_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        try:
+            if self.db.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+                self.db.executescript("DROP TABLE IF EXISTS pages; DROP TABLE IF EXISTS files; "
+                                      "DROP TABLE IF EXISTS documents;")
+            self.db.executescript(SCHEMA)
+        except sqlite3.OperationalError as e:
+            self.db.close()
+            raise ValueError(f"Full-text search needs SQLite with FTS5: {e}")
+        self.db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @traced("index")
+    def update(self, paths, workers=1, prune=False, progress=None):
+        # Indexes new and changed files. prune drops files that no longer exist.
+        start = time.perf_counter()
+        paths = [os.path.abspath(path) for path in paths]
+        known = {path: (size, mtime_ns) for path, size, mtime_ns in
+                 self.db.execute("SELECT path, size, mtime_ns FROM files")}
+        stats = {"files": len(paths), "unchanged": 0, "renamed": 0, "indexed": 0, "pages": 0,
+                 "removed": 0, "failed": 0, "errors": {}}
+
+        changed = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                stats["errors"][path] = str(e)
+                continue
+            if known.get(path) == (stat.st_size, stat.st_mtime_ns):
+                stats["unchanged"] += 1
+            else:
+                changed[path] = (stat.st_size, stat.st_mtime_ns)
+
+        # Content already indexed under another path only needs a files row.
+        # New content is read once however many copies of it there are.
+        copies = {}
+        with span("hash", files=len(changed)):
+            for path, digest, error in _map(_hash_file, list(changed), workers):
+                if error:
+                    stats["errors"][path] = error
+                    continue
+                row = self.db.execute("SELECT id FROM documents WHERE hash = ?", (digest,)).fetchone()
+                if row:
+                    self._set_file(path, row[0], changed[path])
+                    stats["renamed"] += 1
+                else:
+                    copies.setdefault(digest, []).append(path)
+        self.db.commit()
+
+        to_read = [group[0] for group in copies.values()]
+        digests = {group[0]: digest for digest, group in copies.items()}
+        with span("extract text", files=len(to_read), workers=workers):
+            for done, (path, texts, error) in enumerate(_map(_read_text, to_read, workers), 1):
+                digest = digests[path]
+                if error:
+                    stats["errors"].update((copy, error) for copy in copies[digest])
+                else:
+                    document = self._add_document(digest, texts)
+                    for copy in copies[digest]:
+                        self._set_file(copy, document, changed[copy])
+                    stats["indexed"] += len(copies[digest])
+                    stats["pages"] += len(texts)
+                if done % COMMIT_EVERY == 0:
+                    self.db.commit()
+                report(progress, done, len(to_read))
+        self.db.commit()
+
+        if prune:
+            with span("prune"):
+                stats["removed"] = self._prune()
+        stats["failed"] = len(stats["errors"])
+        stats["seconds"] = time.perf_counter() - start
+        return OperationResult(
+            "index",
+            outputs=[self.path],
+            page_count=stats["pages"],
+            message=(f"Indexed {stats['indexed']} file(s) ({stats['pages']} pages), "
+                     f"{stats['unchanged'] + stats['renamed']} unchanged, {stats['failed']} failed"),
+            stats=stats
+        )
+
+    def search(self, query, limit=20, raw=False):
+        # Pages matching query, best first. query is taken literally unless
+        # raw is set, in which case it is FTS5 syntax (AND, OR, NEAR, "...", prefix*).
+        match = query if raw else phrase_query(query)
+        if not match:
+            return []
+        try:
+            rows = self.db.execute(
+                f"""SELECT files.path, pages.rowid & {MAX_PAGES},
+                           snippet(pages, 0, '[', ']', '...', {SNIPPET_TOKENS})
+                    FROM pages JOIN files ON files.document = pages.rowid >> {PAGE_BITS}
+                    WHERE pages MATCH ? ORDER BY pages.rank LIMIT ?""",
+                (match, limit)
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query: {e}")
+        return [{"path": path, "page": page, "snippet": snippet} for path, page, snippet in rows]
+
+    def summary(self):
+        documents, pages = self.db.execute("SELECT COUNT(*), COALESCE(SUM(pages), 0) FROM documents").fetchone()
+        files = self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        return {"files": files, "documents": documents, "pages": pages, "bytes": os.path.getsize(self.path)}
+
+    def _set_file(self, path, document, signature):
+        previous = self.db.execute("SELECT document FROM files WHERE path = ?", (path,)).fetchone()
+        self.db.execute("INSERT OR REPLACE INTO files (path, document, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                        (path, document, *signature))
+        if previous and previous[0] != document:
+            self._drop_if_unused(previous[0])
+
+    def _add_document(self, digest, texts):
+        cursor = self.db.execute("INSERT INTO documents (hash, pages) VALUES (?, ?)", (digest, len(texts)))
+        document = cursor.lastrowid
+        self.db.executemany(
+            "INSERT INTO pages (rowid, text) VALUES (?, ?)",
+            (((document << PAGE_BITS) | page, text) for page, text in enumerate(texts, 1) if text.strip())
+        )
+        return document
+
+    def _drop_if_unused(self, document):
+        if self.db.execute("SELECT 1 FROM files WHERE document = ?", (document,)).fetchone():
+            return
+        self.db.execute("DELETE FROM pages WHERE rowid BETWEEN ? AND ?",
+                        (document << PAGE_BITS, (document << PAGE_BITS) | MAX_PAGES))
+        self.db.execute("DELETE FROM documents WHERE id = ?", (document,))
+
+    def _prune(self):
+        removed = 0
+        for path, document in self.db.execute("SELECT path, document FROM files").fetchall():
+            if not os.path.exists(path):
+                self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+                self._drop_if_unused(document)
+                removed += 1
+        self.db.commit()
+        return removed
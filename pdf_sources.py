@@ -0,0 +1,60 @@
+import mmap
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+def source_size(source):
+    # Size in bytes of a path or seekable stream
+    if is_path(source):
+        return os.path.getsize(source)
+    position = source.tell()
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(position)
+    return size
+
+
+def source_stem(source, default="document"):
+    if is_path(source):
+        return Path(source).stem
+    name = getattr(source, "name", None)
+    return Path(name).stem if isinstance(name, str) else default
+
+
+@contextmanager
+def open_input(source):
+    # Read-only file object for a path or stream. Paths are memory-mapped, so
+    # readers that would otherwise copy the whole file into memory (PyPDF2
+    # does for paths and for file objects handed to PdfMerger) read straight
+    # from the page cache, and only the pages they touch count towards RSS.
+    if not is_path(source):
+        if source.seekable():
+            source.seek(0)
+        yield source
+        return
+    with open(source, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            yield f
+            return
+        with mapped:
+            yield mapped
+
+
+def open_fitz(source):
+    # fitz only takes filenames or in-memory bytes, so streams are read here.
+    # Paths are not: MuPDF reads objects from the file on demand.
+    # Streams are rewound first since another reader may have consumed them.
+    import fitz  # PyMuPDF
+    if is_path(source):
+        return fitz.open(source)
+    if source.seekable():
+        source.seek(0)
+    return fitz.open(stream=source.read(), filetype="pdf")
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import queue
+import threading
+from collections import OrderedDict, namedtuple
+
+THUMBNAIL_SIZE = 160
+MEMORY_CACHE_ITEMS = 256
+# Documents kept open by the render thread, so scrolling through one file
+# doesn't reopen it for every page
+OPEN_DOCUMENTS = 4
+
+Thumbnail = namedtuple("Thumbnail", ["path", "page", "png", "page_count"])
+
+
+def cache_key(path, page):
+    # Keyed by mtime and size too, so an edited file never shows stale pages
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{page}"
+
+
+class ThumbnailCache:
+    # Bounded in-memory LRU in front of an on-disk cache directory
+    def __init__(self, cache_dir, max_items=MEMORY_CACHE_ITEMS):
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".png")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                value = f.read()
+        except OSError:
+            return None
+        self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        self._remember(key, value)
+        with open(self._disk_path(key), "wb") as f:
+            f.write(value)
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+
+class ThumbnailRenderer:
+    # Renders thumbnails on one background thread (PyMuPDF documents are not
+    # thread-safe). Newest requests are served first and reset() drops
+    # everything still queued, so scrolling never waits on rows that are
+    # already off screen. Finished thumbnails are collected with poll().
+    def __init__(self, cache, size=THUMBNAIL_SIZE):
+        self.cache = cache
+        self.size = size
+        self.results = queue.Queue()
+        self._requests = queue.LifoQueue()
+        self._pending = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._documents = OrderedDict()
+        self._page_counts = {}
+        self._thread = threading.Thread(target=self._run, name="thumbnails", daemon=True)
+        self._thread.start()
+
+    def request(self, path, page=0):
+        with self._lock:
+            if (path, page) in self._pending:
+                return
+            self._pending.add((path, page))
+            self._requests.put((self._generation, path, page))
+
+    def reset(self):
+        with self._lock:
+            self._generation += 1
+            self._pending.clear()
+
+    def poll(self):
+        thumbnails = []
+        while True:
+            try:
+                thumbnails.append(self.results.get_nowait())
+            except queue.Empty:
+                return thumbnails
+
+    def close(self):
+        self._requests.put(None)
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            generation, path, page = request
+            with self._lock:
+                if generation != self._generation:
+                    continue
+                self._pending.discard((path, page))
+            try:
+                self.results.put(self._thumbnail(path, page))
+            except Exception as e:
+                print(f"Failed to render thumbnail for {path}: {e}")
+        for doc in self._documents.values():
+            doc.close()
+
+    def _thumbnail(self, path, page):
+        key = cache_key(path, page)
+        png = self.cache.get(key)
+        if png is None:
+            doc = self._open(path)
+            png = render_thumbnail(doc[page], self.size)
+            self.cache.put(key, png)
+        count_key = cache_key(path, "pages")
+        if count_key not in self._page_counts:
+            self._page_counts[count_key] = len(self._open(path))
+        return Thumbnail(path, page, png, self._page_counts[count_key])
+
+    def _open(self, path):
+        if path in self._documents:
+            self._documents.move_to_end(path)
+            return self._documents[path]
+        # Imported here, on the render thread, so startup doesn't pay for it
+        import fitz  # PyMuPDF
+        doc = fitz.open(path)
+        self._documents[path] = doc
+        while len(self._documents) > OPEN_DOCUMENTS:
+            self._documents.popitem(last=False)[1].close()
+        return doc
+
+
+def render_thumbnail(page, size=THUMBNAIL_SIZE):
+    import fitz  # PyMuPDF
+    scale = size / max(page.rect.width, page.rect.height)
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+    return pixmap.tobytes("png")
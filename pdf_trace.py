@@ -0,0 +1,237 @@
+import functools
+import io
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from pdf_metrics import peak_rss
+
+TRACE_ENV_VAR = "PDF_MERGER_TRACE"
+TRACE_FORMAT_ENV_VAR = "PDF_MERGER_TRACE_FORMAT"
+TRACE_FORMATS = ["jsonl", "otlp"]
+PROFILE_MODES = ["cpu", "memory"]
+PROFILE_TOP = 30
+SERVICE_NAME = "pdf-merger"
+
+
+class Span:
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add(self, key, amount=1):
+        # Counters such as pages or bytes written
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+
+class _NullSpan:
+    # Handed out while tracing is off so instrumented code needs no checks
+    def set(self, key, value):
+        pass
+
+    def add(self, key, amount=1):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class JsonLinesExporter:
+    # One JSON object per finished span
+    def __init__(self, path):
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        self._write(span.to_dict())
+
+    def _write(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpJsonExporter(JsonLinesExporter):
+    # OTLP/JSON lines, as read by the OpenTelemetry Collector's otlpjsonfile
+    # receiver, so traces can be loaded into Jaeger, Tempo and the like
+    # without an OpenTelemetry SDK installed here
+    def export(self, span):
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        self._write({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "pdf_merger"}, "spans": [otlp_span]}]
+        }]})
+
+
+EXPORTERS = {"jsonl": JsonLinesExporter, "otlp": OtlpJsonExporter}
+
+
+class Tracer:
+    # Nested timing spans per thread. Disabled until configure() is called,
+    # in which case span() costs one attribute check.
+    def __init__(self):
+        self.exporter = None
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return self.exporter is not None
+
+    def configure(self, path=None, format="jsonl"):
+        if format not in EXPORTERS:
+            raise ValueError(f"Unknown trace format: {format}")
+        if self.exporter:
+            self.exporter.close()
+        self.exporter = EXPORTERS[format](path) if path else None
+
+    def current(self):
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else NULL_SPAN
+
+    @contextmanager
+    def span(self, name, **attributes):
+        if not self.enabled:
+            yield NULL_SPAN
+            return
+
+        stack = self._local.__dict__.setdefault("stack", [])
+        parent = stack[-1] if stack else None
+        span = Span(name, parent.trace_id if parent else os.urandom(16).hex(),
+                    parent.span_id if parent else None, attributes)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            stack.pop()
+            span.end_ns = time.time_ns()
+            self.exporter.export(span)
+
+    def count(self, key, amount=1):
+        self.current().add(key, amount)
+
+
+tracer = Tracer()
+span = tracer.span
+count = tracer.count
+
+if os.environ.get(TRACE_ENV_VAR):
+    # Also reaches worker processes, which inherit the environment
+    tracer.configure(os.environ[TRACE_ENV_VAR], os.environ.get(TRACE_FORMAT_ENV_VAR) or "jsonl")
+
+
+def _output_bytes(outputs):
+    return sum(os.path.getsize(path) for path in outputs
+               if isinstance(path, (str, os.PathLike)) and os.path.isfile(path))
+
+
+def traced(operation):
+    # Wraps an engine operation in a root span that records its totals
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(operation) as root:
+                result = func(*args, **kwargs)
+                root.set("page_count", result.page_count)
+                root.set("outputs", len(result.outputs))
+                root.set("output_bytes", _output_bytes(result.outputs))
+                root.set("peak_rss", peak_rss())
+                return result
+        return wrapper
+    return decorate
+
+
+def profile_call(mode, func, *args, output=None, **kwargs):
+    # Runs func once under cProfile ("cpu") or tracemalloc ("memory") and
+    # writes the top entries to output, or stderr when output is None
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+
+    if mode == "cpu":
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            if output and output.endswith(".prof"):
+                # Raw stats for snakeviz, pstats and similar viewers
+                profiler.dump_stats(output)
+            else:
+                buffer = io.StringIO()
+                pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(PROFILE_TOP)
+                _write_report(buffer.getvalue(), output, sys.stderr)
+
+    import tracemalloc
+    tracemalloc.start(25)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        lines = [f"Traced memory: current {current / 1024 / 1024:.1f} MB, peak {peak / 1024 / 1024:.1f} MB"]
+        lines.extend(str(stat) for stat in snapshot.statistics("lineno")[:PROFILE_TOP])
+        _write_report("\n".join(lines) + "\n", output, sys.stderr)
+
+
+def _write_report(text, output, stream):
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    else:
+        stream.write(text)
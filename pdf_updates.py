@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from pdf_parallel import report
+
+# Seconds to wait for the release server before giving up
+UPDATE_TIMEOUT = 5
+# A successful check is reused for this long, so most starts skip the network
+CHECK_INTERVAL = 24 * 60 * 60
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+# Reconnects after a dropped connection, each resuming where the last stopped
+DOWNLOAD_RETRIES = 5
+# Release asset listing "<sha256>  <file name>" for every other asset
+MANIFEST_ASSET = "SHA256SUMS"
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+
+def is_newer_version(latest_version, current_version):
+    current = [int(x) for x in current_version.split(".")]
+    latest = [int(x) for x in latest_version.split(".")]
+    return latest > current
+
+
+def executable_asset(assets):
+    # Release assets come in no particular order, so the manifest may be
+    # listed first. Prefers an .exe, then any other asset that isn't it.
+    names = [name for name in assets if name != MANIFEST_ASSET]
+    for name in names:
+        if name.lower().endswith(".exe"):
+            return name
+    return names[0] if names else None
+
+
+def fetch_latest_release(url, timeout=UPDATE_TIMEOUT):
+    # requests is only needed here, off the startup path
+    import requests
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    assets = {asset["name"]: asset["browser_download_url"] for asset in data.get("assets", [])}
+    executable = executable_asset(assets)
+    return {
+        "version": data["tag_name"].replace("v", ""),
+        "download_url": assets[executable] if executable else None,
+        "assets": assets,
+        "checked": time.time()
+    }
+
+
+class UpdateChecker:
+    # Looks up the latest release on a daemon thread so a slow or missing
+    # network never holds up the window. The answer is cached in cache_path
+    # and collected on the Tk thread with poll().
+    def __init__(self, url, cache_path, timeout=UPDATE_TIMEOUT, max_age=CHECK_INTERVAL):
+        self.url = url
+        self.cache_path = cache_path
+        self.timeout = timeout
+        self.max_age = max_age
+        self.results = queue.Queue()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="update-check", daemon=True)
+        self._thread.start()
+
+    def poll(self):
+        # The release dict once the check has finished, otherwise None
+        try:
+            return self.results.get_nowait()
+        except queue.Empty:
+            return None
+
+    def cached_release(self):
+        try:
+            with open(self.cache_path) as f:
+                release = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - release.get("checked", 0) > self.max_age or release.get("url") != self.url:
+            return None
+        return release
+
+    def _run(self):
+        release = self.cached_release()
+        if release is None:
+            try:
+                release = fetch_latest_release(self.url, self.timeout)
+            except Exception as e:
+                print(f"Failed to check for updates: {e}")
+                return
+            release["url"] = self.url
+            try:
+                os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+                with open(self.cache_path, "w") as f:
+                    json.dump(release, f)
+            except OSError as e:
+                print(f"Failed to cache update check: {e}")
+        self.results.put(release)
+
+
+def asset_name(url):
+    return os.path.basename(urlparse(url).path)
+
+
+def parse_manifest(text):
+    # sha256sum output: "<hex digest>  <name>", with "*" marking binary mode
+    checksums = {}
+    for line in text.splitlines():
+        parts = line.strip().split(None, 1)
+        if len(parts) == 2 and re.fullmatch(r"[0-9a-fA-F]{64}", parts[0]):
+            checksums[parts[1].lstrip("*")] = parts[0].lower()
+    return checksums
+
+
+def expected_checksum(release, download_url, timeout=UPDATE_TIMEOUT):
+    # Refuses releases without a manifest entry, so an unverified
+    # executable is never installed
+    import requests
+    manifest_url = release.get("assets", {}).get(MANIFEST_ASSET)
+    if not manifest_url:
+        raise ValueError(f"Release has no {MANIFEST_ASSET} manifest")
+    response = requests.get(manifest_url, timeout=timeout)
+    response.raise_for_status()
+    checksum = parse_manifest(response.text).get(asset_name(download_url))
+    if not checksum:
+        raise ValueError(f"{MANIFEST_ASSET} has no entry for {asset_name(download_url)}")
+    return checksum
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fetch_part(url, part_path, timeout, progress):
+    # Appends the rest of url to part_path. Returns True once the server
+    # reports nothing left to send.
+    import requests
+    have = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {"Range": f"bytes={have}-"} if have else {}
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416:
+            # Range starts at or past the end: the part file is complete
+            return True
+        response.raise_for_status()
+
+        match = CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+        if response.status_code == 206 and match and int(match.group(1)) == have:
+            total = int(match.group(3)) if match.group(3) != "*" else None
+            mode = "ab"
+        else:
+            # The server ignored the range, so start over
+            have = 0
+            length = response.headers.get("Content-Length")
+            total = int(length) if length else None
+            mode = "wb"
+
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                have += len(chunk)
+                report(progress, have, total or have)
+    return total is None or have >= total
+
+
+def download_file(url, dest, sha256=None, timeout=UPDATE_TIMEOUT, retries=DOWNLOAD_RETRIES, progress=None):
+    # Streams url into dest + ".part", resuming a partial file left by an
+    # earlier attempt with an HTTP Range request. dest only appears, through
+    # an atomic rename, once the whole file is there and matches sha256.
+    import requests
+    part_path = os.fspath(dest) + ".part"
+    resumed = os.path.exists(part_path)
+    for attempt in range(retries + 1):
+        try:
+            if _fetch_part(url, part_path, timeout, progress):
+                break
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+            if attempt == retries:
+                raise
+    else:
+        raise IOError(f"Download of {url} did not complete")
+
+    if sha256 and file_sha256(part_path) != sha256.lower():
+        # A corrupt part file must not be resumed from next time
+        os.remove(part_path)
+        if resumed:
+            # The partial file may be left over from an older release, so
+            # fetch the whole file once before giving up
+            return download_file(url, dest, sha256, timeout, retries, progress)
+        raise ValueError(f"Checksum mismatch for {asset_name(url)}")
+    os.replace(part_path, dest)
+    return dest
+
+
+def download_update(release, dest, timeout=UPDATE_TIMEOUT, progress=None):
+    # Job entry point: verified download of the release executable to dest
+    from pdf_engine import OperationResult
+    url = release["download_url"]
+    checksum = expected_checksum(release, url, timeout)
+    download_file(url, dest, sha256=checksum, timeout=timeout, progress=progress)
+    return OperationResult(
+        "update",
+        outputs=[dest],
+        message=f"Downloaded version {release['version']}",
+        stats={"bytes": os.path.getsize(dest), "sha256": checksum}
+    )
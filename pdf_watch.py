@@ -0,0 +1,668 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import shutil
+import signal
+import struct
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import pdf_engine
+from pdf_batch import PDF_EXTENSIONS, load_checkpoint
+from pdf_pipeline import INPUT_STEPS, run_pipeline
+from pdf_trace import span
+
+WATCH_STEPS = ["convert", "merge", "compress", "rotate"]
+DEFAULT_PIPELINE = ["convert", "merge"]
+# Seconds the main loop waits for events before checking on files and jobs
+WATCH_TICK = 0.25
+POLL_INTERVAL = 2.0
+# A file is ready once its size and mtime have not changed for this long
+SETTLE_SECONDS = 2.0
+BATCH_SIZE = 50
+BATCH_WINDOW = 30.0
+STATS_INTERVAL = 60.0
+# Seconds between sweeps that forget processed files which no longer exist
+FORGET_INTERVAL = 300.0
+# Scratch space inside the output directory, so finished files are moved
+# into place with a rename on the same filesystem
+WORK_PREFIX = ".watch-"
+# Names scanners, browsers and copy tools use while a file is still being written
+TEMP_SUFFIXES = (".part", ".tmp", ".crdownload")
+
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def parse_pipeline(spec):
+    # "convert,merge,compress" -> ["convert", "merge", "compress"]
+    steps = [step.strip() for step in spec.split(",") if step.strip()] if isinstance(spec, str) else list(spec)
+    if not steps:
+        raise ValueError("The pipeline needs at least one step")
+    for step in steps:
+        if step not in WATCH_STEPS:
+            raise ValueError(f"Unknown pipeline step: {step}")
+    if steps.count("merge") > 1:
+        raise ValueError("A pipeline can merge only once")
+    if "merge" in steps and "convert" in steps[steps.index("merge"):]:
+        raise ValueError("convert must come before merge")
+    return steps
+
+
+def is_candidate(path, extensions):
+    name = os.path.basename(path)
+    if name.startswith((".", "~")) or name.lower().endswith(TEMP_SUFFIXES):
+        return False
+    return os.path.splitext(name)[1].lower() in extensions
+
+
+def walk_files(roots, recursive=True):
+    for root in roots:
+        if not recursive:
+            with os.scandir(root) as entries:
+                yield from (entry.path for entry in entries if entry.is_file())
+            continue
+        for directory, subdirs, files in os.walk(root):
+            subdirs[:] = [name for name in subdirs if not name.startswith(".")]
+            yield from (os.path.join(directory, name) for name in files)
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _can_open(path):
+    # On Windows a file still held open by the writer can't be opened
+    try:
+        with open(path, "rb"):
+            return True
+    except OSError:
+        return False
+
+
+class InotifyWatcher:
+    # Linux inotify through libc, reporting paths created, written or moved
+    # into the watched directories. Local filesystems only: writes made by
+    # other machines to a network share raise no events.
+    kind = "inotify"
+
+    def __init__(self, roots, recursive=True):
+        self.roots = roots
+        self.recursive = recursive
+        self.dirs = {}
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify is not available")
+        try:
+            for root in roots:
+                self._add_tree(root)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _add_tree(self, directory):
+        directories = [directory]
+        if self.recursive:
+            for parent, subdirs, _ in os.walk(directory):
+                subdirs[:] = [name for name in subdirs if not name.startswith(".")]
+                directories.extend(os.path.join(parent, name) for name in subdirs)
+        for path in directories:
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"Cannot watch {path}")
+            self.dirs[wd] = path
+
+    def scan(self):
+        return list(walk_files(self.roots, self.recursive))
+
+    def changes(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                # The kernel queue overflowed and events were lost
+                paths.extend(self.scan())
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if not mask & IN_ISDIR:
+                paths.append(path)
+            elif self.recursive and mask & (IN_CREATE | IN_MOVED_TO) and not os.path.basename(path).startswith("."):
+                # Files can land in a new directory before it is watched
+                try:
+                    self._add_tree(path)
+                except OSError:
+                    continue
+                paths.extend(walk_files([path]))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    # Rescans the watched directories every interval and reports files whose
+    # size or mtime changed. Works everywhere, including network shares.
+    kind = "polling"
+
+    def __init__(self, roots, recursive=True, interval=POLL_INTERVAL):
+        self.roots = roots
+        self.recursive = recursive
+        self.interval = interval
+        self.snapshot = {}
+        self.next_scan = 0
+
+    def _stat_all(self):
+        found = {}
+        for path in walk_files(self.roots, self.recursive):
+            try:
+                found[path] = file_signature(path)
+            except OSError:
+                continue
+        self.next_scan = time.monotonic() + self.interval
+        return found
+
+    def scan(self):
+        self.snapshot = self._stat_all()
+        return list(self.snapshot)
+
+    def changes(self, timeout):
+        remaining = self.next_scan - time.monotonic()
+        if remaining > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0, remaining))
+        current = self._stat_all()
+        changed = [path for path, signature in current.items() if self.snapshot.get(path) != signature]
+        self.snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher(roots, recursive=True, poll=False, poll_interval=POLL_INTERVAL):
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots, recursive)
+        except (OSError, AttributeError) as e:
+            # AttributeError: a libc without inotify
+            print(f"inotify unavailable, polling instead: {e}")
+    return PollingWatcher(roots, recursive, poll_interval)
+
+
+class Debouncer:
+    # Holds changed files until their size and mtime have stayed the same
+    # for settle seconds and they can be opened, so half-copied scans are
+    # never picked up
+    def __init__(self, settle=SETTLE_SECONDS):
+        self.settle = settle
+        # path -> [signature, stable since, first seen]
+        self.pending = {}
+
+    def touch(self, path, now):
+        entry = self.pending.get(path)
+        if entry is None:
+            self.pending[path] = [None, now, now]
+        else:
+            entry[1] = now
+
+    def ready(self, now, limit=None):
+        found = []
+        for path, entry in list(self.pending.items()):
+            if limit is not None and len(found) >= limit:
+                break
+            try:
+                signature = file_signature(path)
+            except OSError:
+                # Deleted or renamed away before it settled
+                del self.pending[path]
+                continue
+            if signature != entry[0]:
+                entry[0], entry[1] = signature, now
+                continue
+            if now - entry[1] < self.settle or not _can_open(path):
+                continue
+            del self.pending[path]
+            found.append(WatchedFile(path, signature, entry[2]))
+        return found
+
+
+@dataclass
+class WatchedFile:
+    path: str
+    signature: tuple
+    first_seen: float
+
+    @property
+    def size(self):
+        return self.signature[0]
+
+
+@dataclass
+class WatchConfig:
+    inputs: list
+    output_dir: str
+    steps: list = field(default_factory=lambda: list(DEFAULT_PIPELINE))
+    # preset for compress, rotation for rotate, dedupe for merge
+    options: dict = field(default_factory=dict)
+    workers: int = 1
+    batch_size: int = BATCH_SIZE
+    batch_window: float = BATCH_WINDOW
+    settle: float = SETTLE_SECONDS
+    # Jobs in flight before new files are left waiting; 0 means workers * 2
+    max_pending: int = 0
+    stats_interval: float = STATS_INTERVAL
+    poll: bool = False
+    poll_interval: float = POLL_INTERVAL
+    recursive: bool = True
+    checkpoint: str = None
+    archive_dir: str = None
+    # Process what is there, then exit once idle
+    once: bool = False
+
+
+@dataclass
+class _Batch:
+    number: int
+    opened: float
+    files: list = field(default_factory=list)
+    # input path -> PDF to merge (the input itself or its prepared copy)
+    parts: dict = field(default_factory=dict)
+    preparing: int = 0
+    closed: bool = False
+    submitted: bool = False
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class WatchStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.files_done = 0
+        self.files_failed = 0
+        self.outputs = 0
+        self.pages = 0
+        self.input_bytes = 0
+        self._latencies = []
+        self._mark = (self.started, 0, 0)
+
+    def add(self, ok, size, latency):
+        if ok:
+            self.files_done += 1
+            self.input_bytes += size
+            self._latencies.append(latency)
+        else:
+            self.files_failed += 1
+
+    def snapshot(self, waiting=0, queued=0, running=0):
+        # Throughput since the previous snapshot, and latency from a file
+        # first being seen to its output being in place
+        now = time.monotonic()
+        since, files, input_bytes = self._mark
+        seconds = max(now - since, 1e-9)
+        latencies = sorted(self._latencies)
+        self._latencies = []
+        self._mark = (now, self.files_done, self.input_bytes)
+        return {
+            "uptime_seconds": now - self.started,
+            "files_done": self.files_done,
+            "files_failed": self.files_failed,
+            "outputs": self.outputs,
+            "pages": self.pages,
+            "waiting": waiting,
+            "queued": queued,
+            "running": running,
+            "files_per_sec": (self.files_done - files) / seconds,
+            "mb_per_sec": (self.input_bytes - input_bytes) / (1024 * 1024) / seconds,
+            "latency_p50": _percentile(latencies, 0.5),
+            "latency_p95": _percentile(latencies, 0.95),
+            "latency_max": latencies[-1] if latencies else None
+        }
+
+
+def pipeline_stages(steps, options):
+    # Watch steps as in-memory pipeline stages with the watch options applied
+    stages = []
+    for step in steps:
+        if step == "merge":
+            stages.append({"op": "merge", "dedupe": options.get("dedupe", False)})
+        elif step == "compress":
+            stages.append({"op": "compress", "preset": options.get("preset")})
+        elif step == "rotate":
+            stages.append({"op": "rotate", "rotation": options.get("rotation", 90)})
+        else:
+            stages.append({"op": step})
+    if stages[0]["op"] not in INPUT_STEPS:
+        # Load the single input to work on
+        stages.insert(0, {"op": "merge"})
+    return stages
+
+
+def run_stage(inputs, steps, output, options):
+    # Worker-process entry point; never raises. The steps run as one
+    # in-memory pipeline whose result is written next to output and renamed
+    # into place, so output only ever appears complete.
+    start = time.perf_counter()
+    record = {"output": output, "steps": steps, "pages": 0}
+    work_dir = None
+    try:
+        work_dir = tempfile.mkdtemp(prefix=WORK_PREFIX, dir=os.path.dirname(output))
+        target = os.path.join(work_dir, "output.pdf")
+        with span("watch stage", steps=",".join(steps), inputs=len(inputs)):
+            if steps:
+                result = run_pipeline(pipeline_stages(steps, options), target, inputs)
+                record["pages"] = result.page_count
+            else:
+                # Nothing to apply, e.g. convert on a PDF
+                shutil.copyfile(inputs[0], target)
+        os.replace(target, output)
+    except Exception as e:
+        record.update(status="error", error=str(e))
+    else:
+        record.update(status="ok", output_bytes=os.path.getsize(output))
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+def _ignore_interrupts():
+    # Ctrl+C stops the service, which lets running jobs finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _unique_path(directory, name, taken=()):
+    stem, extension = os.path.splitext(name)
+    path = os.path.join(directory, name)
+    number = 1
+    while path in taken or os.path.exists(path):
+        path = os.path.join(directory, f"{stem}-{number}{extension}")
+        number += 1
+    return path
+
+
+class WatchService:
+    # Watches input directories and runs each settled file through a
+    # pipeline of engine steps on a process pool. Steps before "merge" run
+    # per file as soon as it settles; the prepared files are then merged per
+    # batch (batch_size files, or whatever arrived within batch_window
+    # seconds) and the remaining steps run on the merged file. Without
+    # "merge" every file gets its own output.
+    def __init__(self, config, on_record=None, on_stats=None):
+        self.config = config
+        self.on_record = on_record
+        self.on_stats = on_stats
+        self.steps = parse_pipeline(config.steps)
+        if "merge" in self.steps:
+            merge_at = self.steps.index("merge")
+            self.before, self.after = self.steps[:merge_at], self.steps[merge_at:]
+        else:
+            self.before, self.after = self.steps, None
+        self.extensions = PDF_EXTENSIONS + (pdf_engine.IMAGE_EXTENSIONS if "convert" in self.steps else [])
+        self.limit = config.max_pending or config.workers * 2
+        self.roots = [os.path.abspath(path) for path in config.inputs]
+        self.output_dir = os.path.abspath(config.output_dir)
+        self.work_dir = os.path.join(self.output_dir, WORK_PREFIX + "work")
+        self.archive_dir = os.path.abspath(config.archive_dir) if config.archive_dir else None
+        for root in self.roots:
+            if not os.path.isdir(root):
+                raise ValueError(f"Not a directory: {root}")
+            if os.path.commonpath([root, self.output_dir]) == root:
+                raise ValueError("The output directory must not be inside a watched directory")
+            # Archived inputs would be picked up again as new files
+            if self.archive_dir and (self.archive_dir == root or
+                                     config.recursive and os.path.commonpath([root, self.archive_dir]) == root):
+                raise ValueError("The archive directory must not be inside a watched directory")
+
+        self.stats = WatchStats()
+        self.debouncer = Debouncer(config.settle)
+        self.running = {}
+        self.batches = []
+        self.active = set()
+        # path -> signature when last processed, so unchanged files are skipped.
+        # Archived files are dropped at once, removed ones by _forget_removed.
+        self.processed = {}
+        # Outputs of running jobs; finished ones exist on disk instead
+        self.reserved = set()
+        self.watcher_kind = None
+        self._finished_before = load_checkpoint(config.checkpoint)
+        self._batch_numbers = iter(range(1, sys.maxsize))
+        self._log = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def stopping(self):
+        return self._stop.is_set()
+
+    @property
+    def idle(self):
+        return not (self.debouncer.pending or self.running or self.batches)
+
+    def run(self):
+        config = self.config
+        os.makedirs(self.output_dir, exist_ok=True)
+        for name in os.listdir(self.output_dir):
+            if name.startswith(WORK_PREFIX):
+                # Scratch files left by a run that was killed
+                shutil.rmtree(os.path.join(self.output_dir, name), ignore_errors=True)
+        os.makedirs(self.work_dir)
+        watcher = open_watcher(self.roots, config.recursive, config.poll, config.poll_interval)
+        self.watcher_kind = watcher.kind
+        self._log = open(config.checkpoint, "a") if config.checkpoint else None
+        next_stats = time.monotonic() + config.stats_interval
+        next_forget = time.monotonic() + FORGET_INTERVAL
+        try:
+            with ProcessPoolExecutor(max_workers=config.workers, initializer=_ignore_interrupts) as pool:
+                self._touch(watcher.scan())
+                while not self._stop.is_set():
+                    self._touch(watcher.changes(WATCH_TICK))
+                    now = time.monotonic()
+                    self._step(pool, now, flush=config.once and not self.debouncer.pending)
+                    if config.once and self.idle:
+                        break
+                    if config.stats_interval and now >= next_stats:
+                        self._report_stats()
+                        next_stats = now + config.stats_interval
+                    if now >= next_forget:
+                        self._forget_removed()
+                        next_forget = now + FORGET_INTERVAL
+
+                # Take no new files, but finish every batch already started
+                while self.running or self.batches:
+                    self._close_batches(pool, time.monotonic(), flush=True)
+                    self._collect(WATCH_TICK)
+        finally:
+            watcher.close()
+            if self._log:
+                self._log.close()
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+        self._report_stats()
+        return self.stats
+
+    def _touch(self, paths):
+        now = time.monotonic()
+        for path in paths:
+            if is_candidate(path, self.extensions):
+                self.debouncer.touch(path, now)
+
+    def _step(self, pool, now, flush=False):
+        self._collect(0)
+        self._close_batches(pool, now, flush)
+        # Backpressure: settled files wait in the debouncer while the pool is full
+        room = self.limit - len(self.running)
+        if room > 0:
+            for item in self.debouncer.ready(now, room):
+                self._accept(pool, item, now)
+
+    def _accept(self, pool, item, now):
+        if item.path in self.active:
+            # Changed again while being processed; look at it once that finishes
+            self.debouncer.touch(item.path, now)
+            return
+        if item.path in self._finished_before:
+            # Done by an earlier run according to the checkpoint
+            self._finished_before.discard(item.path)
+            self.processed[item.path] = item.signature
+            return
+        if self.processed.get(item.path) == item.signature:
+            return
+
+        self.active.add(item.path)
+        # Only images need converting
+        steps = [step for step in self.before
+                 if step != "convert" or os.path.splitext(item.path)[1].lower() not in PDF_EXTENSIONS]
+        if self.after is None:
+            name = os.path.splitext(os.path.basename(item.path))[0] + ".pdf"
+            self._submit(pool, "file", [item], [item.path], steps, self._reserve(name))
+            return
+
+        if self.batches and not self.batches[-1].closed:
+            batch = self.batches[-1]
+        else:
+            batch = _Batch(next(self._batch_numbers), now)
+            self.batches.append(batch)
+        batch.files.append(item)
+        if steps:
+            batch.preparing += 1
+            part = os.path.join(self.work_dir, f"{batch.number}-{len(batch.files)}.pdf")
+            self._submit(pool, "prepare", (batch, item), [item.path], steps, part)
+        else:
+            batch.parts[item.path] = item.path
+        if len(batch.files) >= self.config.batch_size:
+            batch.closed = True
+
+    def _close_batches(self, pool, now, flush=False):
+        for batch in list(self.batches):
+            if not batch.closed and (flush or now - batch.opened >= self.config.batch_window):
+                batch.closed = True
+            if not batch.closed or batch.preparing or batch.submitted:
+                continue
+            if not batch.files:
+                # Every file failed to prepare
+                self.batches.remove(batch)
+                continue
+            if len(self.running) >= self.limit and not flush:
+                break
+            batch.submitted = True
+            name = f"batch-{time.strftime('%Y%m%d-%H%M%S')}-{batch.number:04d}.pdf"
+            parts = [batch.parts[item.path] for item in batch.files]
+            self._submit(pool, "batch", batch, parts, self.after, self._reserve(name))
+
+    def _submit(self, pool, kind, target, inputs, steps, output):
+        future = pool.submit(run_stage, inputs, steps, output, self.config.options)
+        self.running[future] = (kind, target)
+
+    def _collect(self, timeout):
+        if not self.running:
+            return
+        done, _ = wait(list(self.running), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            kind, target = self.running.pop(future)
+            record = future.result()
+            if kind == "prepare":
+                batch, item = target
+                batch.preparing -= 1
+                if record["status"] == "ok":
+                    batch.parts[item.path] = record["output"]
+                else:
+                    batch.files.remove(item)
+                    self._finish([item], record)
+            elif kind == "file":
+                self._finish(target, record)
+            else:
+                self.batches.remove(target)
+                self._finish(target.files, record)
+                for part in target.parts.values():
+                    if part.startswith(self.work_dir):
+                        os.remove(part)
+
+    def _finish(self, items, record):
+        now = time.monotonic()
+        ok = record["status"] == "ok"
+        record["inputs"] = [item.path for item in items]
+        for item in items:
+            self.active.discard(item.path)
+            self.processed[item.path] = item.signature
+            self.stats.add(ok, item.size, now - item.first_seen)
+            if self._log:
+                # One line per input, in the same format as batch checkpoints
+                self._log.write(json.dumps({"input": item.path, "status": record["status"],
+                                            "output": record["output"], "error": record.get("error")}) + "\n")
+                self._log.flush()
+        self.reserved.discard(record["output"])
+        if ok:
+            self.stats.outputs += 1
+            self.stats.pages += record["pages"]
+            if self.archive_dir:
+                self._archive(items)
+        if self.on_record:
+            self.on_record(record)
+
+    def _archive(self, items):
+        # Moves finished inputs out of the watched directories
+        os.makedirs(self.archive_dir, exist_ok=True)
+        for item in items:
+            try:
+                shutil.move(item.path, _unique_path(self.archive_dir, os.path.basename(item.path)))
+            except OSError as e:
+                print(f"Failed to archive {item.path}: {e}")
+            else:
+                self.processed.pop(item.path, None)
+
+    def _forget_removed(self):
+        # A file that comes back under the same name is new, and is
+        # processed whatever its signature
+        for path in [path for path in self.processed if not os.path.exists(path)]:
+            del self.processed[path]
+
+    def _reserve(self, name):
+        # Names are claimed when a job starts, so two jobs never share an output
+        path = _unique_path(self.output_dir, name, self.reserved)
+        self.reserved.add(path)
+        return path
+
+    def _report_stats(self):
+        queued = sum(len(batch.files) for batch in self.batches)
+        snapshot = self.stats.snapshot(len(self.debouncer.pending), queued, len(self.running))
+        if self.on_stats:
+            self.on_stats(snapshot)